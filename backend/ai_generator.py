@@ -1,10 +1,93 @@
 import anthropic
-from typing import List, Optional, Dict, Any
+import atexit
+import hashlib
+import httpx
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, List, Optional, Dict, Any, Iterator
 import logging
 
+from response_cache import ResponseCache
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Shared keep-alive connection pool so every AIGenerator (and every API call
+# within a tool round) reuses warm TCP/TLS connections
+_HTTP_CLIENT = anthropic.DefaultHttpxClient(
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+)
+atexit.register(_HTTP_CLIENT.close)
+
+# Upper bound on tool calls from a single response that run concurrently
+MAX_TOOL_CONCURRENCY = 10
+
+# Worker pool shared by every AIGenerator: independent tool calls requested in
+# one response run in parallel
+_TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_TOOL_CONCURRENCY, thread_name_prefix="tool")
+atexit.register(_TOOL_EXECUTOR.shutdown)
+
+# User-facing fallback when no round produced an answer; never cached
+EMPTY_RESPONSE_MESSAGE = "I apologize, but I received an empty response. Please try your query again."
+
+# Prompt lines that only apply when the named tool is available; a paragraph
+# that starts with one of these lines is dropped as a whole
+TOOL_PROMPT_MARKERS = {
+    "search_course_content": (
+        "- **Content search tool**",
+        "- **Course content questions**",
+    ),
+    "get_course_outline": (
+        "- **Course outline tool**",
+        "Course Outline Queries:",
+        "- **Course outline questions**",
+    ),
+}
+
+
+@lru_cache(maxsize=128)
+def _build_system(system_prompt: str, conversation_history: Optional[str]) -> tuple:
+    """
+    Build system prompt blocks with the static prompt marked for caching.
+    
+    Only the system prompt carries the cache_control marker; the conversation
+    history changes between sessions and is sent as a separate uncached block.
+    Memoized so each history is formatted once rather than on every call.
+    """
+    blocks = ({
+        "type": "text",
+        "text": system_prompt,
+        "cache_control": {"type": "ephemeral"}
+    },)
+    if conversation_history:
+        blocks += ({
+            "type": "text",
+            "text": f"Previous conversation:\n{conversation_history}"
+        },)
+    return blocks
+
+
+@lru_cache(maxsize=32)
+def _specialize_prompt(system_prompt: str, tool_names: frozenset) -> str:
+    """Strip the passages of system_prompt that describe tools not in tool_names"""
+    markers = tuple(
+        marker
+        for name, tool_markers in TOOL_PROMPT_MARKERS.items() if name not in tool_names
+        for marker in tool_markers
+    )
+    if not markers:
+        return system_prompt
+    
+    paragraphs = []
+    for paragraph in system_prompt.split("\n\n"):
+        if paragraph.startswith(markers):
+            continue
+        paragraphs.append("\n".join(
+            line for line in paragraph.split("\n") if not line.startswith(markers)
+        ))
+    return "\n\n".join(paragraphs)
+
 class AIGenerator:
     """Handles interactions with Anthropic's Claude API for generating responses"""
     
@@ -46,7 +129,7 @@ Provide only the direct answer to what was asked.
 """
     
     def __init__(self, api_key: str, model: str):
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self.client = anthropic.Anthropic(api_key=api_key, http_client=_HTTP_CLIENT)
         self.model = model
         
         # Pre-build base API parameters
@@ -55,6 +138,60 @@ Provide only the direct answer to what was asked.
             "temperature": 0,
             "max_tokens": 800
         }
+        
+        # Responses are deterministic (temperature 0), so identical requests can be served from cache
+        self.cache = ResponseCache(max_entries=1024, ttl_seconds=3600)
+        
+        # Last (tools, marked tools) pair, reused while callers pass the same definitions list
+        self._marked_tools: Optional[tuple] = None
+    
+    def build_system_prompt(self, tool_names: frozenset) -> str:
+        """Return SYSTEM_PROMPT without the guidance for tools missing from tool_names"""
+        return _specialize_prompt(self.SYSTEM_PROMPT, tool_names)
+    
+    def _build_system_content(self, conversation_history: Optional[str] = None,
+                              tools: Optional[List] = None) -> tuple:
+        """Return the (shared, memoized) system prompt blocks for this history and toolset"""
+        system_prompt = self.SYSTEM_PROMPT
+        if tools:
+            system_prompt = self.build_system_prompt(frozenset(tool["name"] for tool in tools))
+        return _build_system(system_prompt, conversation_history or None)
+    
+    @staticmethod
+    def _with_cached_tools(tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return a copy of tools with a cache_control marker on the last definition"""
+        return [*tools[:-1], {**tools[-1], "cache_control": {"type": "ephemeral"}}]
+    
+    @staticmethod
+    def _extract_text(response) -> str:
+        """Return the text of the first text block in response, or "" if there is none"""
+        return next((block.text for block in response.content or ()
+                     if getattr(block, "type", None) == "text"), "")
+    
+    def _prepared_tools(self, tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Return the cache-marked tools list, rebuilding it only when tools changes.
+        
+        ToolManager memoizes its definitions, so the same list object arrives on
+        every query and the marked copy is built once rather than per request.
+        """
+        marked = self._marked_tools
+        if marked is None or marked[0] is not tools:
+            marked = (tools, self._with_cached_tools(tools))
+            self._marked_tools = marked
+        return marked[1]
+    
+    def _cache_key(self, query: str,
+                   conversation_history: Optional[str] = None,
+                   tools: Optional[List] = None) -> str:
+        """Build a response cache key from everything that shapes the model output"""
+        payload = json.dumps({
+            "model": self.model,
+            "query": query,
+            "history": conversation_history,
+            "tools": sorted(tool["name"] for tool in tools or [])
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
     
     def generate_response(self, query: str,
                          conversation_history: Optional[str] = None,
@@ -72,224 +209,362 @@ Provide only the direct answer to what was asked.
             max_rounds: Maximum rounds for sequential tool calling (default 2)
             
         Returns:
-            Generated response as string
+            Generated response as string; API errors are returned as a user-facing message
+        """
+        return "".join(self._generate(
+            query, conversation_history, tools, tool_manager, max_rounds, stream=False
+        ))
+    
+    def generate_responses_batch(self, queries: List[str],
+                                 conversation_history: Optional[str] = None,
+                                 tools: Optional[List] = None,
+                                 tool_manager_factory: Optional[Callable[[], Any]] = None,
+                                 max_rounds: int = 2,
+                                 batch_concurrency: int = 8) -> List[str]:
+        """
+        Generate responses for independent queries concurrently.
+        
+        Requests fan out over a bounded worker pool and share the pooled HTTP
+        client, so a batch costs roughly its slowest queries rather than the sum.
+        Tool managers track the sources of their last search, so every query
+        gets a fresh one from tool_manager_factory instead of sharing one.
+        
+        Args:
+            queries: The questions to answer
+            conversation_history: Previous messages for context, shared by all queries
+            tools: Available tools the AI can use
+            tool_manager_factory: Builds the manager that executes one query's tools
+            max_rounds: Maximum rounds for sequential tool calling (default 2)
+            batch_concurrency: Maximum number of requests in flight (default 8)
+            
+        Returns:
+            Generated responses in the same order as queries
+        """
+        if not queries:
+            return []
+        
+        def generate(query: str) -> str:
+            return self.generate_response(
+                query,
+                conversation_history=conversation_history,
+                tools=tools,
+                tool_manager=tool_manager_factory() if tool_manager_factory else None,
+                max_rounds=max_rounds
+            )
+        
+        with ThreadPoolExecutor(max_workers=min(batch_concurrency, len(queries))) as executor:
+            return list(executor.map(generate, queries))
+    
+    def generate_response_stream(self, query: str,
+                                 conversation_history: Optional[str] = None,
+                                 tools: Optional[List] = None,
+                                 tool_manager=None,
+                                 max_rounds: int = 2) -> Iterator[str]:
+        """
+        Generate AI response as a stream of text chunks.
+        
+        Only calls made without tools are streamed, including the final call
+        after max_rounds. Tool-calling rounds are read whole, since only the stop
+        reason tells an answer from a tool request, so an answer from a tool
+        round arrives as one chunk.
+        
+        Args:
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            tools: Available tools the AI can use
+            tool_manager: Manager to execute tools
+            max_rounds: Maximum rounds for sequential tool calling (default 2)
             
-        Raises:
-            Exception: If API call fails or other errors occur
+        Yields:
+            Chunks of the generated response text
         """
+        return self._generate(
+            query, conversation_history, tools, tool_manager, max_rounds, stream=True
+        )
+    
+    def _generate(self, query: str,
+                  conversation_history: Optional[str],
+                  tools: Optional[List],
+                  tool_manager,
+                  max_rounds: int,
+                  stream: bool) -> Iterator[str]:
+        """
+        Yield the response to query, serving it from and storing it in the response cache.
+        
+        Chunks are text deltas when stream is set, otherwise the whole answer at
+        once. Only a non-empty model answer is cached; fallbacks and errors are not.
+        An error after part of a stream was yielded is raised rather than appended
+        to the partial answer.
+        """
+        # Serve repeated requests from cache, restoring the sources they produced
+        cache_key = self._cache_key(query, conversation_history, tools)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.debug("Response cache hit")
+            response_text, sources = cached
+            if tool_manager:
+                tool_manager.set_last_sources(sources)
+            yield response_text
+            return
         
+        chunks = []
         try:
+            # Built once per query and shared by every API call it makes
+            system_content = self._build_system_content(conversation_history, tools)
+            
             # Route to multi-round logic if tools and tool_manager are available
-            if tools and tool_manager:
-                return self._execute_tool_rounds(
+            use_tools = bool(tools and tool_manager)
+            if use_tools:
+                answer = self._execute_tool_rounds(
                     query=query,
-                    conversation_history=conversation_history,
+                    system_content=system_content,
                     tools=tools,
                     tool_manager=tool_manager,
-                    max_rounds=max_rounds
+                    max_rounds=max_rounds,
+                    stream=stream
+                )
+            else:
+                # Single API call without tools (preserves backward compatibility)
+                logger.debug("Making single API call to %s with query: %.100s...", self.model, query)
+                answer = self._answer_without_tools(
+                    [{"role": "user", "content": query}],
+                    system_content,
+                    stream
                 )
             
-            # Fallback to single API call without tools (preserves backward compatibility)
-            system_content = (
-                f"{self.SYSTEM_PROMPT}\n\nPrevious conversation:\n{conversation_history}"
-                if conversation_history 
-                else self.SYSTEM_PROMPT
-            )
-            
-            # Prepare API call parameters efficiently
-            api_params = {
-                **self.base_params,
-                "messages": [{"role": "user", "content": query}],
-                "system": system_content
-            }
-            
-            logger.debug(f"Making single API call to {self.model} with query: {query[:100]}...")
-            
-            # Get response from Claude (no tools in this path)
-            response = self.client.messages.create(**api_params)
+            for text in answer:
+                chunks.append(text)
+                yield text
             
-            # Return direct response
-            if response.content and len(response.content) > 0:
-                return response.content[0].text
-            else:
-                logger.warning("Received empty response from API")
-                return "I apologize, but I received an empty response. Please try your query again."
-                
-        except anthropic.AuthenticationError as e:
-            logger.error(f"Authentication error: {e}")
+        except Exception as e:
+            if chunks:
+                # Part of the answer is already out; let the caller report the failure
+                logger.error("Response stream failed after %d chunks: %s", len(chunks), e)
+                raise
+            yield self._error_message(e)
+            return
+        
+        if chunks:
+            sources = tool_manager.get_last_sources() if use_tools else []
+            self.cache.set(cache_key, ("".join(chunks), sources))
+        else:
+            logger.warning("Received empty response from API")
+            yield EMPTY_RESPONSE_MESSAGE
+    
+    def _answer_without_tools(self, messages: List[Dict],
+                              system_content: tuple,
+                              stream: bool) -> Iterator[str]:
+        """
+        Make one API call that cannot request tools and yield its text.
+        
+        When stream is set the call is streamed and text deltas are yielded as
+        they arrive; otherwise the complete text is yielded once.
+        """
+        api_params = {
+            **self.base_params,
+            "messages": messages,
+            "system": system_content
+        }
+        
+        if not stream:
+            response_text = self._extract_text(self.client.messages.create(**api_params))
+            if response_text:
+                yield response_text
+            return
+        
+        with self.client.messages.stream(**api_params) as response_stream:
+            for text in response_stream.text_stream:
+                if text:
+                    yield text
+    
+    def _error_message(self, error: Exception) -> str:
+        """Log an error from response generation and return a user-facing message"""
+        if isinstance(error, anthropic.AuthenticationError):
+            logger.error("Authentication error: %s", error)
             return "Authentication failed. Please check the API key configuration."
-        except anthropic.RateLimitError as e:
-            logger.error(f"Rate limit exceeded: {e}")
+        if isinstance(error, anthropic.RateLimitError):
+            logger.error("Rate limit exceeded: %s", error)
             return "Rate limit exceeded. Please try again in a moment."
-        except anthropic.APIError as e:
-            logger.error(f"API error occurred: {e}")
-            return f"API error occurred: {str(e)}. Please try again."
-        except Exception as e:
-            logger.error(f"Unexpected error in generate_response: {e}", exc_info=True)
-            return f"An unexpected error occurred: {str(e)}. Please try again."
+        if isinstance(error, anthropic.APIError):
+            logger.error("API error occurred: %s", error)
+            return f"API error occurred: {str(error)}. Please try again."
+        logger.error("Unexpected error in response generation: %s", error, exc_info=True)
+        return f"An unexpected error occurred: {str(error)}. Please try again."
     
     def _execute_tool_rounds(self, query: str,
-                           conversation_history: Optional[str] = None,
+                           system_content: tuple,
                            tools: Optional[List] = None,
                            tool_manager=None,
-                           max_rounds: int = 2) -> str:
+                           max_rounds: int = 2,
+                           stream: bool = False) -> Iterator[str]:
         """
         Execute multiple rounds of tool calling and reasoning.
         
         Args:
             query: The user's question or request
-            conversation_history: Previous messages for context
+            system_content: System prompt blocks, including any conversation history
             tools: Available tools the AI can use
             tool_manager: Manager to execute tools
             max_rounds: Maximum number of rounds (default 2)
+            stream: Whether to stream the final call made without tools
             
-        Returns:
-            Final response after up to max_rounds of tool calling
+        Yields:
+            Text of the final response after up to max_rounds of tool calling;
+            nothing if no round produced an answer
         """
         
-        try:
-            # Build system content efficiently
-            system_content = (
-                f"{self.SYSTEM_PROMPT}\n\nPrevious conversation:\n{conversation_history}"
-                if conversation_history 
-                else self.SYSTEM_PROMPT
-            )
-            
-            # Initialize conversation with user query
-            messages = [{"role": "user", "content": query}]
+        # Initialize conversation with user query
+        messages = [{"role": "user", "content": query}]
+        
+        # Mark tool schemas once so every call shares the cached prefix
+        cached_tools = self._prepared_tools(tools)
+        
+        # Execute up to max_rounds of tool calling
+        for round_num in range(1, max_rounds + 1):
+            logger.debug("Starting tool round %d/%d", round_num, max_rounds)
             
-            # Execute up to max_rounds of tool calling
-            for round_num in range(1, max_rounds + 1):
-                logger.debug(f"Starting tool round {round_num}/{max_rounds}")
-                
-                response_text, has_tool_use, updated_messages = self._execute_single_round(
-                    messages=messages,
-                    system_content=system_content,
-                    tools=tools,
-                    tool_manager=tool_manager
-                )
-                
-                # Update messages for next round
-                messages = updated_messages
-                
-                # Check termination conditions
-                if not has_tool_use:
-                    logger.debug(f"Natural termination after round {round_num} - no tool use")
-                    return response_text
-                
-                # If we've hit max rounds but there's still tool use pending,
-                # execute one more round to complete the tool interaction gracefully
-                if round_num >= max_rounds:
-                    if has_tool_use and round_num == max_rounds:
-                        logger.debug(f"Max rounds reached but tool use pending - executing final round")
-                        # Execute one final round to handle the pending tool use
-                        final_response_text, final_has_tool_use, final_messages = self._execute_single_round(
-                            messages=messages,
-                            system_content=system_content,
-                            tools=tools,
-                            tool_manager=tool_manager
-                        )
-                        return final_response_text
-                    else:
-                        logger.debug(f"Max rounds ({max_rounds}) reached - terminating")
-                        return response_text
+            response_text, has_tool_use, updated_messages = self._execute_single_round(
+                messages=messages,
+                system_content=system_content,
+                tools=cached_tools,
+                tool_manager=tool_manager
+            )
             
-            # Fallback (shouldn't reach here with current logic)
-            return "I apologize, but I couldn't complete the task within the allowed rounds."
+            # Update messages for next round
+            messages = updated_messages
             
-        except Exception as e:
-            logger.error(f"Unexpected error in _execute_tool_rounds: {e}", exc_info=True)
-            return f"An unexpected error occurred during multi-round processing: {str(e)}. Please try again."
+            # Check termination conditions
+            if not has_tool_use:
+                logger.debug("Natural termination after round %d - no tool use", round_num)
+                if response_text:
+                    yield response_text
+                return
+        
+        # Round budget spent with tool results pending: one final call without
+        # tools forces a text answer, so termination costs exactly one request
+        logger.debug("Max rounds (%d) reached - requesting final answer without tools", max_rounds)
+        yield from self._answer_without_tools(messages, system_content, stream)
     
     def _execute_single_round(self, messages: List[Dict], 
-                            system_content: str,
+                            system_content: tuple,
                             tools: Optional[List] = None,
-                            tool_manager=None) -> tuple[str, bool, List[Dict]]:
+                            tool_manager=None) -> tuple[Optional[str], bool, List[Dict]]:
         """
-        Execute a single round of API call + complete all tool execution within that round.
+        Execute a single round: one API call plus execution of any tools it requests.
+        
+        Takes ownership of messages: the list is extended in place and returned
+        as updated_messages rather than copied.
         
         Args:
-            messages: Current conversation messages
-            system_content: System prompt content
+            messages: Current conversation messages (mutated in place)
+            system_content: System prompt content blocks
             tools: Available tools the AI can use
             tool_manager: Manager to execute tools
             
         Returns:
-            Tuple of (response_text, has_tool_use_for_next_round, updated_messages)
+            Tuple of (response_text, has_tool_use_for_next_round, updated_messages);
+            response_text is None when the round produced neither text nor tool results
         """
         
-        current_messages = messages.copy()
+        # Prepare API call parameters
+        api_params = {
+            **self.base_params,
+            "messages": messages,
+            "system": system_content
+        }
         
-        # Keep executing tools until we get a non-tool response
-        while True:
-            # Prepare API call parameters
-            api_params = {
-                **self.base_params,
-                "messages": current_messages,
-                "system": system_content
-            }
+        # Add tools if available (keep tools in every round)
+        if tools:
+            api_params["tools"] = tools
+            api_params["tool_choice"] = {"type": "auto"}
+        
+        logger.debug("Making API call within single round")
+        
+        # Get response from Claude
+        response = self.client.messages.create(**api_params)
+        
+        # Add assistant response to messages
+        messages.append({"role": "assistant", "content": response.content})
+        
+        # Check if tools were used
+        if response.stop_reason == "tool_use" and tool_manager:
+            # Execute all tools in this response
+            tool_results = self._run_tools(
+                [block for block in response.content if block.type == "tool_use"],
+                tool_manager
+            )
             
-            # Add tools if available (key change - keep tools in every round)
-            if tools:
-                api_params["tools"] = tools
-                api_params["tool_choice"] = {"type": "auto"}
+            if tool_results:
+                # Tool results feed the next round's API call
+                messages.append({"role": "user", "content": tool_results})
+                return None, True, messages
             
-            logger.debug(f"Making API call within single round")
+            # Tool use without any tool blocks - nothing to feed back
+            logger.warning("Received tool_use stop reason without tool blocks")
+            return None, False, messages
+        
+        # No tool use - end of round
+        response_text = self._extract_text(response)
+        if response_text:
+            return response_text, False, messages
+        
+        logger.warning("Received empty response from API")
+        return None, False, messages
+    
+    def _run_tools(self, tool_blocks: List[Any], tool_manager) -> List[Dict[str, Any]]:
+        """
+        Execute tool calls from a single response, concurrently when there are several.
+        
+        Concurrent calls do not record their sources as they finish; each call's
+        sources are kept and recorded in tool_use order afterwards, so the last
+        search wins exactly as it does when the calls run one after another.
+        
+        Args:
+            tool_blocks: tool_use content blocks to execute
+            tool_manager: Manager to execute tools
             
-            # Get response from Claude
-            response = self.client.messages.create(**api_params)
+        Returns:
+            Tool result blocks in the same order as tool_blocks
+        """
+        if len(tool_blocks) < 2:
+            return [self._run_tool(block, tool_manager.execute_tool) for block in tool_blocks]
+        
+        found_sources = [None] * len(tool_blocks)
+        
+        def run(index: int) -> Dict[str, Any]:
+            def execute(tool_name: str, **kwargs) -> str:
+                result, found_sources[index] = tool_manager.run_tool(tool_name, **kwargs)
+                return result
+            return self._run_tool(tool_blocks[index], execute)
+        
+        # map preserves input order, keeping tool_use_id pairing stable
+        tool_results = list(_TOOL_EXECUTOR.map(run, range(len(tool_blocks))))
+        for block, sources in zip(tool_blocks, found_sources):
+            tool_manager.record_sources(block.name, sources)
+        return tool_results
+    
+    def _run_tool(self, content_block, execute: Callable[..., str]) -> Dict[str, Any]:
+        """Execute one tool_use block with execute and wrap the outcome as a tool_result block"""
+        try:
+            logger.debug("Executing tool: %s with input: %s", content_block.name, content_block.input)
+            tool_result = execute(
+                content_block.name, 
+                **content_block.input
+            )
             
-            # Add assistant response to messages
-            current_messages.append({"role": "assistant", "content": response.content})
+            return {
+                "type": "tool_result",
+                "tool_use_id": content_block.id,
+                "content": tool_result
+            }
             
-            # Check if tools were used
-            if response.stop_reason == "tool_use" and tool_manager:
-                # Execute all tools in this response
-                tool_results = []
-                for content_block in response.content:
-                    if content_block.type == "tool_use":
-                        try:
-                            logger.debug(f"Executing tool: {content_block.name} with input: {content_block.input}")
-                            tool_result = tool_manager.execute_tool(
-                                content_block.name, 
-                                **content_block.input
-                            )
-                            
-                            tool_results.append({
-                                "type": "tool_result",
-                                "tool_use_id": content_block.id,
-                                "content": tool_result
-                            })
-                            
-                        except Exception as e:
-                            logger.error(f"Tool execution failed for {content_block.name}: {e}")
-                            tool_results.append({
-                                "type": "tool_result",
-                                "tool_use_id": content_block.id,
-                                "content": f"Tool execution failed: {str(e)}"
-                            })
-                
-                # Add tool results and continue the loop
-                if tool_results:
-                    current_messages.append({"role": "user", "content": tool_results})
-                    continue  # Continue the loop to make another API call
-                else:
-                    # No tool results - treat as end of round
-                    break
-            else:
-                # No tool use - end of round
-                if response.content and len(response.content) > 0:
-                    response_text = response.content[0].text
-                    return response_text, False, current_messages
-                else:
-                    logger.warning("Received empty response from API")
-                    response_text = "I apologize, but I received an empty response. Please try your query again."
-                    current_messages.append({"role": "assistant", "content": response_text})
-                    return response_text, False, current_messages
-        
-        # If we break out of the loop, it means we had tool use but something went wrong
-        response_text = "I apologize, but I encountered an issue processing tools."
-        return response_text, False, current_messages
+        except Exception as e:
+            logger.error("Tool execution failed for %s: %s", content_block.name, e)
+            return {
+                "type": "tool_result",
+                "tool_use_id": content_block.id,
+                "content": f"Tool execution failed: {str(e)}"
+            }
     
     def _handle_tool_execution(self, initial_response, base_params: Dict[str, Any], tool_manager):
         """
@@ -316,7 +591,7 @@ Provide only the direct answer to what was asked.
             for content_block in initial_response.content:
                 if content_block.type == "tool_use":
                     try:
-                        logger.debug(f"Executing tool: {content_block.name} with input: {content_block.input}")
+                        logger.debug("Executing tool: %s with input: %s", content_block.name, content_block.input)
                         tool_result = tool_manager.execute_tool(
                             content_block.name, 
                             **content_block.input
@@ -329,7 +604,7 @@ Provide only the direct answer to what was asked.
                         })
                         
                     except Exception as e:
-                        logger.error(f"Tool execution failed for {content_block.name}: {e}")
+                        logger.error("Tool execution failed for %s: %s", content_block.name, e)
                         # Add error as tool result so AI can handle it
                         tool_results.append({
                             "type": "tool_result",
@@ -353,21 +628,22 @@ Provide only the direct answer to what was asked.
             # Get final response
             final_response = self.client.messages.create(**final_params)
             
-            if final_response.content and len(final_response.content) > 0:
-                return final_response.content[0].text
+            final_text = self._extract_text(final_response)
+            if final_text:
+                return final_text
             else:
                 logger.warning("Received empty final response after tool execution")
                 return "I apologize, but I couldn't generate a proper response after using the tools. Please try again."
                 
         except anthropic.AuthenticationError as e:
-            logger.error(f"Authentication error during tool execution: {e}")
+            logger.error("Authentication error during tool execution: %s", e)
             return "Authentication failed during tool execution. Please check the API key configuration."
         except anthropic.RateLimitError as e:
-            logger.error(f"Rate limit exceeded during tool execution: {e}")
+            logger.error("Rate limit exceeded during tool execution: %s", e)
             return "Rate limit exceeded during tool execution. Please try again in a moment."
         except anthropic.APIError as e:
-            logger.error(f"API error during tool execution: {e}")
+            logger.error("API error during tool execution: %s", e)
             return f"API error during tool execution: {str(e)}. Please try again."
         except Exception as e:
-            logger.error(f"Unexpected error during tool execution: {e}", exc_info=True)
+            logger.error("Unexpected error during tool execution: %s", e, exc_info=True)
             return f"An unexpected error occurred during tool execution: {str(e)}. Please try again."
\ No newline at end of file
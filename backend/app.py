@@ -5,12 +5,15 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional
+import json
 import os
 
 from config import config
 from rag_system import RAGSystem
+from system_diagram import DIAGRAM_PATH
 
 # Initialize FastAPI app
 app = FastAPI(title="Course Materials RAG System", root_path="")
@@ -51,6 +54,15 @@ class QueryResponse(BaseModel):
     sources: List[Source]
     session_id: str
 
+class BatchQueryRequest(BaseModel):
+    """Request model for bulk course queries"""
+    # Every query is a full Claude round trip, so cap the work one request can start
+    queries: List[str] = Field(max_length=50)
+
+class BatchQueryResponse(BaseModel):
+    """Response model for bulk course queries"""
+    answers: List[str]
+
 class CourseStats(BaseModel):
     """Response model for course statistics"""
     total_courses: int
@@ -91,6 +103,40 @@ async def query_documents(request: QueryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/query/batch", response_model=BatchQueryResponse)
+def query_documents_batch(request: BatchQueryRequest):
+    """Answer many independent queries concurrently (bulk evaluation / offline runs)"""
+    try:
+        return BatchQueryResponse(answers=rag_system.query_batch(request.queries))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/query/stream")
+async def query_documents_stream(request: QueryRequest):
+    """Process a query and stream the response as newline-delimited JSON events"""
+    session_id = request.session_id
+    if not session_id:
+        session_id = rag_system.session_manager.create_session()
+    
+    def event_stream():
+        try:
+            for event in rag_system.query_stream(request.query, session_id):
+                if event["type"] == "sources":
+                    event = {
+                        "type": "done",
+                        "sources": [
+                            source if isinstance(source, dict) else {"text": str(source), "url": None}
+                            for source in event["sources"]
+                        ],
+                        "session_id": session_id
+                    }
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+    
+    # Sync generator: Starlette iterates it in a worker thread
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 @app.get("/api/courses", response_model=CourseStats)
 async def get_course_stats():
     """Get course analytics and statistics"""
@@ -103,6 +149,13 @@ async def get_course_stats():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/diagram")
+async def get_diagram():
+    """Serve the prebuilt architecture diagram (rendered offline by system_diagram.py)"""
+    if not DIAGRAM_PATH.exists():
+        raise HTTPException(status_code=404, detail="Architecture diagram has not been built")
+    return FileResponse(DIAGRAM_PATH, media_type="image/svg+xml")
+
 @app.delete("/api/session/{session_id}")
 async def clear_session(session_id: str):
     """Clear a conversation session"""
@@ -1,4 +1,4 @@
-from typing import List, Tuple, Optional, Dict
+from typing import List, Tuple, Optional, Dict, Iterator
 import os
 from document_processor import DocumentProcessor
 from vector_store import VectorStore
@@ -26,6 +26,13 @@ class RAGSystem:
         self.tool_manager.register_tool(self.search_tool)
         self.tool_manager.register_tool(self.outline_tool)
     
+    def _create_tool_manager(self) -> ToolManager:
+        """Build a tool manager with its own tools, so its sources belong to one query"""
+        tool_manager = ToolManager()
+        tool_manager.register_tool(CourseSearchTool(self.vector_store))
+        tool_manager.register_tool(CourseOutlineTool(self.vector_store))
+        return tool_manager
+    
     def add_course_document(self, file_path: str) -> Tuple[Course, int]:
         """
         Add a single course document to the knowledge base.
@@ -46,6 +53,9 @@ class RAGSystem:
             # Add course content chunks to vector store
             self.vector_store.add_course_content(course_chunks)
             
+            # Cached answers were generated without this course
+            self.ai_generator.cache.clear()
+            
             return course, len(course_chunks)
         except Exception as e:
             print(f"Error processing course document {file_path}: {e}")
@@ -69,6 +79,7 @@ class RAGSystem:
         if clear_existing:
             print("Clearing existing data for fresh rebuild...")
             self.vector_store.clear_all_data()
+            self.ai_generator.cache.clear()
         
         if not os.path.exists(folder_path):
             print(f"Folder {folder_path} does not exist")
@@ -99,6 +110,10 @@ class RAGSystem:
                 except Exception as e:
                     print(f"Error processing {file_name}: {e}")
         
+        # Cached answers were generated without the new courses
+        if total_courses:
+            self.ai_generator.cache.clear()
+        
         return total_courses, total_chunks
     
     def query(self, query: str, session_id: Optional[str] = None) -> Tuple[str, List[str]]:
@@ -141,6 +156,63 @@ class RAGSystem:
         # Return response with sources from tool searches
         return response, sources
     
+    def query_batch(self, queries: List[str]) -> List[str]:
+        """
+        Answer independent queries concurrently, without session context.
+        
+        Intended for bulk evaluation and offline runs. Each query runs against its
+        own tool manager, so batch searches never touch the sources of other requests.
+        
+        Args:
+            queries: User questions
+            
+        Returns:
+            Responses in the same order as queries
+        """
+        prompts = [f"""Answer this question about course materials: {query}""" for query in queries]
+        
+        return self.ai_generator.generate_responses_batch(
+            prompts,
+            tools=self.tool_manager.get_tool_definitions(),
+            tool_manager_factory=self._create_tool_manager
+        )
+    
+    def query_stream(self, query: str, session_id: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Process a user query, streaming the response as it is generated.
+        
+        Args:
+            query: User's question
+            session_id: Optional session ID for conversation context
+            
+        Yields:
+            {"type": "text", "text": ...} events for each response chunk, followed
+            by a single {"type": "sources", "sources": [...]} event
+        """
+        prompt = f"""Answer this question about course materials: {query}"""
+        
+        history = None
+        if session_id:
+            history = self.session_manager.get_conversation_history(session_id)
+        
+        chunks = []
+        for text in self.ai_generator.generate_response_stream(
+            query=prompt,
+            conversation_history=history,
+            tools=self.tool_manager.get_tool_definitions(),
+            tool_manager=self.tool_manager
+        ):
+            chunks.append(text)
+            yield {"type": "text", "text": text}
+        
+        sources = self.tool_manager.get_last_sources()
+        self.tool_manager.reset_sources()
+        
+        if session_id:
+            self.session_manager.add_exchange(session_id, query, "".join(chunks))
+        
+        yield {"type": "sources", "sources": sources}
+    
     def get_course_analytics(self) -> Dict:
         """Get analytics about the course catalog"""
         return {
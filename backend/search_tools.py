@@ -1,7 +1,15 @@
-from typing import Dict, Any, Optional, Protocol
+import json
+from typing import Dict, Any, Optional, Protocol, Tuple
 from abc import ABC, abstractmethod
 from vector_store import VectorStore, SearchResults
 
+# orjson (installed alongside chromadb) parses lesson metadata several times faster;
+# its JSONDecodeError subclasses json.JSONDecodeError, so error handling is shared
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 
 class Tool(ABC):
     """Abstract base class for all tools"""
@@ -61,6 +69,20 @@ class CourseSearchTool(Tool):
         Returns:
             Formatted search results or error message
         """
+        result, sources = self.execute_with_sources(query, course_name, lesson_number)
+        if sources:
+            # Store sources for retrieval by the UI
+            self.last_sources = sources
+        return result
+    
+    def execute_with_sources(self, query: str, course_name: Optional[str] = None,
+                             lesson_number: Optional[int] = None) -> Tuple[str, list]:
+        """
+        Run the search without storing its sources, so concurrent searches stay independent.
+        
+        Returns:
+            Tuple of (formatted search results or error message, sources of the results)
+        """
         
         # Use the vector store's unified search interface
         results = self.store.search(
@@ -71,7 +93,7 @@ class CourseSearchTool(Tool):
         
         # Handle errors
         if results.error:
-            return results.error
+            return results.error, []
         
         # Handle empty results
         if results.is_empty():
@@ -80,51 +102,36 @@ class CourseSearchTool(Tool):
                 filter_info += f" in course '{course_name}'"
             if lesson_number:
                 filter_info += f" in lesson {lesson_number}"
-            return f"No relevant content found{filter_info}."
+            return f"No relevant content found{filter_info}.", []
         
         # Format and return results
         return self._format_results(results)
     
-    def _format_results(self, results: SearchResults) -> str:
-        """Format search results with course and lesson context"""
-        formatted = []
-        sources = []  # Track sources for the UI with links
+    def _format_results(self, results: SearchResults) -> Tuple[str, list]:
+        """Format search results with course and lesson context, returning (text, sources)"""
+        # Bind link lookups once instead of per row
+        get_lesson_link = self.store.get_lesson_link
+        get_course_link = self.store.get_course_link
         
-        for doc, meta in zip(results.documents, results.metadata):
+        def format_row(doc: str, meta: Dict[str, Any]):
+            """Return (context-headed text, source dict with link) for one result"""
             course_title = meta.get('course_title', 'unknown')
             lesson_num = meta.get('lesson_number')
             
-            # Build context header
-            header = f"[{course_title}"
             if lesson_num is not None:
-                header += f" - Lesson {lesson_num}"
-            header += "]"
-            
-            # Build source with link information
-            source_text = course_title
-            source_url = None
-            
-            if lesson_num is not None:
-                source_text += f" - Lesson {lesson_num}"
-                # Get lesson link from vector store
-                source_url = self.store.get_lesson_link(course_title, lesson_num)
+                label = f"{course_title} - Lesson {lesson_num}"
+                url = get_lesson_link(course_title, lesson_num)
             else:
-                # Get course link if no specific lesson
-                source_url = self.store.get_course_link(course_title)
+                # Fall back to the course link if no specific lesson
+                label = course_title
+                url = get_course_link(course_title)
             
-            # Store structured source data
-            source_data = {
-                "text": source_text,
-                "url": source_url
-            }
-            sources.append(source_data)
-            
-            formatted.append(f"{header}\n{doc}")
+            return f"[{label}]\n{doc}", {"text": label, "url": url}
         
-        # Store sources for retrieval
-        self.last_sources = sources
+        rows = [format_row(doc, meta) for doc, meta in zip(results.documents, results.metadata)]
+        formatted, sources = zip(*rows) if rows else ((), ())
         
-        return "\n\n".join(formatted)
+        return "\n\n".join(formatted), list(sources)
 
 class CourseOutlineTool(Tool):
     """Tool for retrieving course outlines with metadata"""
@@ -175,36 +182,33 @@ class CourseOutlineTool(Tool):
     
     def _format_course_outline(self, metadata: Dict[str, Any]) -> str:
         """Format course metadata into a readable outline"""
-        import json
-        
-        outline = []
-        
         # Course header
         course_title = metadata.get('title', 'Unknown Course')
         course_link = metadata.get('course_link', 'No link available')
         instructor = metadata.get('instructor', 'Unknown Instructor')
         
-        outline.append(f"**Course:** {course_title}")
-        outline.append(f"**Instructor:** {instructor}")
-        outline.append(f"**Course Link:** {course_link}")
-        outline.append("")
-        outline.append("**Lessons:**")
-        
         # Parse lessons from JSON
         lessons_json = metadata.get('lessons_json', '[]')
         try:
-            lessons = json.loads(lessons_json)
+            lessons = json_loads(lessons_json)
             if lessons:
-                for lesson in lessons:
-                    lesson_num = lesson.get('lesson_number', '?')
-                    lesson_title = lesson.get('lesson_title', 'Untitled Lesson')
-                    outline.append(f"- Lesson {lesson_num}: {lesson_title}")
+                lesson_lines = "\n".join(
+                    f"- Lesson {lesson.get('lesson_number', '?')}: {lesson.get('lesson_title', 'Untitled Lesson')}"
+                    for lesson in lessons
+                )
             else:
-                outline.append("- No lessons found")
+                lesson_lines = "- No lessons found"
         except json.JSONDecodeError:
-            outline.append("- Error parsing lesson data")
+            lesson_lines = "- Error parsing lesson data"
         
-        return "\n".join(outline)
+        return (
+            f"**Course:** {course_title}\n"
+            f"**Instructor:** {instructor}\n"
+            f"**Course Link:** {course_link}\n"
+            f"\n"
+            f"**Lessons:**\n"
+            f"{lesson_lines}"
+        )
 
 
 class ToolManager:
@@ -212,6 +216,9 @@ class ToolManager:
     
     def __init__(self):
         self.tools = {}
+        self._definitions_cache = None  # Built on first request, reset on registration
+        self._source_tools = []  # Registered tools that track last_sources
+        self._last_executed_source_tool = None
     
     def register_tool(self, tool: Tool):
         """Register any tool that implements the Tool interface"""
@@ -220,29 +227,68 @@ class ToolManager:
         if not tool_name:
             raise ValueError("Tool must have a 'name' in its definition")
         self.tools[tool_name] = tool
+        self._definitions_cache = None
+        if hasattr(tool, 'last_sources'):
+            self._source_tools.append(tool)
 
     
     def get_tool_definitions(self) -> list:
-        """Get all tool definitions for Anthropic tool calling"""
-        return [tool.get_tool_definition() for tool in self.tools.values()]
+        """Get all tool definitions for Anthropic tool calling (shared list, do not mutate)"""
+        if self._definitions_cache is None:
+            self._definitions_cache = [tool.get_tool_definition() for tool in self.tools.values()]
+        return self._definitions_cache
     
     def execute_tool(self, tool_name: str, **kwargs) -> str:
         """Execute a tool by name with given parameters"""
-        if tool_name not in self.tools:
+        tool = self.tools.get(tool_name)
+        if tool is None:
             return f"Tool '{tool_name}' not found"
         
-        return self.tools[tool_name].execute(**kwargs)
+        result = tool.execute(**kwargs)
+        if tool in self._source_tools:
+            self._last_executed_source_tool = tool
+        return result
+    
+    def run_tool(self, tool_name: str, **kwargs) -> Tuple[str, Optional[list]]:
+        """
+        Execute a tool without recording its sources, so calls can run concurrently.
+        
+        Returns:
+            Tuple of (tool result, sources found by a source-tracking tool or None);
+            pass the sources to record_sources once the call's turn comes
+        """
+        tool = self.tools.get(tool_name)
+        if tool is None:
+            return f"Tool '{tool_name}' not found", None
+        
+        if hasattr(tool, 'execute_with_sources'):
+            return tool.execute_with_sources(**kwargs)
+        return tool.execute(**kwargs), None
+    
+    def record_sources(self, tool_name: str, sources: Optional[list]):
+        """Record sources returned by run_tool as if the call had just run through execute_tool"""
+        if sources is None:
+            return
+        tool = self.tools[tool_name]
+        if sources:
+            tool.last_sources = sources
+        if tool in self._source_tools:
+            self._last_executed_source_tool = tool
     
     def get_last_sources(self) -> list:
-        """Get sources from the last search operation"""
-        # Check all tools for last_sources attribute
-        for tool in self.tools.values():
-            if hasattr(tool, 'last_sources') and tool.last_sources:
-                return tool.last_sources
-        return []
+        """Get sources from the most recently executed source-tracking tool"""
+        if self._last_executed_source_tool is None:
+            return []
+        return self._last_executed_source_tool.last_sources
+
+    def set_last_sources(self, sources: list):
+        """Restore sources on the first source-tracking tool (e.g. for a cached response)"""
+        if self._source_tools:
+            self._source_tools[0].last_sources = sources
+            self._last_executed_source_tool = self._source_tools[0]
 
     def reset_sources(self):
         """Reset sources from all tools that track sources"""
-        for tool in self.tools.values():
-            if hasattr(tool, 'last_sources'):
-                tool.last_sources = []
\ No newline at end of file
+        for tool in self._source_tools:
+            tool.last_sources = []
+        self._last_executed_source_tool = None
\ No newline at end of file
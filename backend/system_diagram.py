@@ -1,13 +1,18 @@
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from matplotlib.patches import FancyBboxPatch, ConnectionPatch
-import numpy as np
+import hashlib
+import os
+from pathlib import Path
+
+# The diagram is fully static, so it only needs redrawing when this script changes.
+# The sidecar file records the hash of the script (and PNG settings) behind the current output.
+# SVG is the primary output: the diagram is pure vector art, so nothing needs rasterizing.
+DIAGRAM_PATH = Path(__file__).with_name('rag_system_diagram.svg')
+
+# SHOW_DIAGRAM=1 opens an interactive window; DIAGRAM_PNG=1 also writes a PNG copy,
+# rendered at print resolution when HIGH_RES=1
+SHOW_DIAGRAM = bool(os.environ.get("SHOW_DIAGRAM"))
+WRITE_PNG = bool(os.environ.get("DIAGRAM_PNG"))
+DPI = 300 if os.environ.get("HIGH_RES") == "1" else 150
 
-# Create figure and axis
-fig, ax = plt.subplots(1, 1, figsize=(16, 12))
-ax.set_xlim(0, 10)
-ax.set_ylim(0, 10)
-ax.axis('off')
 
 # Define colors
 primary_color = '#2E86AB'
@@ -16,155 +21,229 @@ accent_color = '#F18F01'
 text_color = '#333333'
 light_gray = '#F5F5F5'
 
-# Title
-ax.text(5, 9.5, 'Course Materials RAG System Architecture', 
-        fontsize=20, fontweight='bold', ha='center', color=text_color)
-
-# Document Ingestion Flow (Top)
-ax.text(5, 8.8, 'Document Ingestion Flow', fontsize=16, fontweight='bold', 
-        ha='center', color=secondary_color)
-
-# Document box
-doc_box = FancyBboxPatch((0.5, 7.8), 1.5, 0.6, boxstyle="round,pad=0.1", 
-                         facecolor=light_gray, edgecolor=primary_color, linewidth=2)
-ax.add_patch(doc_box)
-ax.text(1.25, 8.1, 'Course\nDocuments\n(.txt, .pdf)', fontsize=10, ha='center', va='center')
-
-# DocumentProcessor box
-proc_box = FancyBboxPatch((2.5, 7.8), 1.5, 0.6, boxstyle="round,pad=0.1", 
-                          facecolor=accent_color, edgecolor=primary_color, linewidth=2)
-ax.add_patch(proc_box)
-ax.text(3.25, 8.1, 'Document\nProcessor\n(Parse & Chunk)', fontsize=10, ha='center', va='center')
-
-# VectorStore box
-vector_box = FancyBboxPatch((4.5, 7.8), 1.5, 0.6, boxstyle="round,pad=0.1", 
-                            facecolor=primary_color, edgecolor=primary_color, linewidth=2)
-ax.add_patch(vector_box)
-ax.text(5.25, 8.1, 'ChromaDB\nVector Store\n(Embeddings)', fontsize=10, ha='center', va='center', color='white')
-
-# ChromaDB collections
-catalog_box = FancyBboxPatch((6.5, 8.1), 1.2, 0.3, boxstyle="round,pad=0.05", 
-                             facecolor=light_gray, edgecolor=primary_color, linewidth=1)
-ax.add_patch(catalog_box)
-ax.text(7.1, 8.25, 'course_catalog', fontsize=8, ha='center', va='center')
-
-content_box = FancyBboxPatch((6.5, 7.7), 1.2, 0.3, boxstyle="round,pad=0.05", 
-                             facecolor=light_gray, edgecolor=primary_color, linewidth=1)
-ax.add_patch(content_box)
-ax.text(7.1, 7.85, 'course_content', fontsize=8, ha='center', va='center')
-
-# Arrows for ingestion flow
-ax.arrow(2, 8.1, 0.4, 0, head_width=0.05, head_length=0.05, fc=text_color, ec=text_color)
-ax.arrow(4, 8.1, 0.4, 0, head_width=0.05, head_length=0.05, fc=text_color, ec=text_color)
-ax.arrow(6, 8.1, 0.4, 0, head_width=0.05, head_length=0.05, fc=text_color, ec=text_color)
-
-# Query Processing Flow (Middle)
-ax.text(5, 6.8, 'Query Processing Flow', fontsize=16, fontweight='bold', 
-        ha='center', color=secondary_color)
-
-# User query
-user_box = FancyBboxPatch((0.5, 5.8), 1.5, 0.6, boxstyle="round,pad=0.1", 
-                          facecolor=light_gray, edgecolor=secondary_color, linewidth=2)
-ax.add_patch(user_box)
-ax.text(1.25, 6.1, 'User Query\n"How does\nretrieval work?"', fontsize=10, ha='center', va='center')
-
-# RAG System
-rag_box = FancyBboxPatch((2.5, 5.8), 1.5, 0.6, boxstyle="round,pad=0.1", 
-                         facecolor=secondary_color, edgecolor=secondary_color, linewidth=2)
-ax.add_patch(rag_box)
-ax.text(3.25, 6.1, 'RAG System\n(Orchestrator)', fontsize=10, ha='center', va='center', color='white')
-
-# AI Generator with Tools
-ai_box = FancyBboxPatch((4.5, 5.8), 1.5, 0.6, boxstyle="round,pad=0.1", 
-                        facecolor=accent_color, edgecolor=accent_color, linewidth=2)
-ax.add_patch(ai_box)
-ax.text(5.25, 6.1, 'Claude AI\n+ Search Tools', fontsize=10, ha='center', va='center')
-
-# Response
-response_box = FancyBboxPatch((6.5, 5.8), 1.5, 0.6, boxstyle="round,pad=0.1", 
-                              facecolor=light_gray, edgecolor=primary_color, linewidth=2)
-ax.add_patch(response_box)
-ax.text(7.25, 6.1, 'AI Response\n+ Sources', fontsize=10, ha='center', va='center')
-
-# Query flow arrows
-ax.arrow(2, 6.1, 0.4, 0, head_width=0.05, head_length=0.05, fc=text_color, ec=text_color)
-ax.arrow(4, 6.1, 0.4, 0, head_width=0.05, head_length=0.05, fc=text_color, ec=text_color)
-ax.arrow(6, 6.1, 0.4, 0, head_width=0.05, head_length=0.05, fc=text_color, ec=text_color)
-
-# Detailed Components (Bottom)
-ax.text(5, 4.8, 'Core Components', fontsize=16, fontweight='bold', 
-        ha='center', color=secondary_color)
-
-# Component boxes
-components = [
-    (1, 3.8, 'FastAPI\nWeb Server\n(app.py)', primary_color),
-    (3, 3.8, 'Session\nManager\n(History)', accent_color),
-    (5, 3.8, 'Search Tools\n(Vector Search)', secondary_color),
-    (7, 3.8, 'Config\n(Settings)', light_gray),
-    (2, 2.8, 'Models\n(Data Classes)', light_gray),
-    (4, 2.8, 'AI Generator\n(Claude API)', accent_color),
-    (6, 2.8, 'Vector Store\n(ChromaDB)', primary_color),
-]
-
-for x, y, label, color in components:
-    if color == light_gray:
-        text_color_box = text_color
+# Core component boxes: (x, y, label, box color, label color). Labels are dark
+# on the light gray boxes and white on the colored ones.
+COMPONENTS = (
+    (1, 3.8, 'FastAPI\nWeb Server\n(app.py)', primary_color, 'white'),
+    (3, 3.8, 'Session\nManager\n(History)', accent_color, 'white'),
+    (5, 3.8, 'Search Tools\n(Vector Search)', secondary_color, 'white'),
+    (7, 3.8, 'Config\n(Settings)', light_gray, text_color),
+    (2, 2.8, 'Models\n(Data Classes)', light_gray, text_color),
+    (4, 2.8, 'AI Generator\n(Claude API)', accent_color, 'white'),
+    (6, 2.8, 'Vector Store\n(ChromaDB)', primary_color, 'white'),
+)
+
+
+def script_hash():
+    """Short content hash of this script"""
+    return hashlib.sha1(Path(__file__).read_bytes()).hexdigest()[:12]
+
+
+def add_texts(ax, entries, **shared):
+    """Add (x, y, text, style) entries to ax as Text artists in data coordinates.
+
+    Builds the artists directly instead of going through ax.text's per-call
+    argument handling; shared style applies to every entry.
+    """
+    from matplotlib.text import Text
+
+    transform = ax.transData
+    for x, y, text, style in entries:
+        ax.add_artist(Text(x, y, text, transform=transform, **shared, **style))
+
+
+def build_diagram(out_path=DIAGRAM_PATH, force=False, png=WRITE_PNG):
+    """Render the architecture diagram as SVG to out_path, skipping the render if it is current.
+
+    With png=True a raster copy is written next to it with a .png suffix.
+    Importing this module is cheap: matplotlib is only loaded once a render is needed.
+    Returns True if the diagram was rendered, False if the cached files were reused.
+    """
+    out_path = Path(out_path)
+    png_path = out_path.with_suffix('.png')
+    hash_path = out_path.with_name(out_path.name + '.hash')
+    current_hash = script_hash() + (f"+png@{DPI}" if png else "")
+    outputs = [out_path, png_path] if png else [out_path]
+    if (not force and all(path.exists() for path in outputs) and hash_path.exists()
+            and hash_path.read_text().strip() == current_hash):
+        return False
+
+    import matplotlib
+    if not SHOW_DIAGRAM:
+        # Headless render: Agg writes files without waking a GUI backend
+        matplotlib.use("Agg", force=True)
+    import matplotlib.pyplot as plt
+
+    plt.rcParams.update({
+        # Fixed element ids and no timestamp keep the SVG byte-identical across renders
+        'svg.hashsalt': 'rag-system-diagram',
+        # Drop sub-pixel vertices from the rounded boxes and stroke curves in one pass
+        'path.simplify': True,
+        'path.simplify_threshold': 1.0,
+        'agg.path.chunksize': 10000,
+    })
+    import matplotlib.patches as patches
+    from matplotlib.collections import LineCollection, PatchCollection
+    from matplotlib.patches import FancyArrowPatch, FancyBboxPatch
+
+    # Create figure and axis
+    fig, ax = plt.subplots(1, 1, figsize=(16, 12))
+    ax.set_xlim(0, 10)
+    ax.set_ylim(0, 10)
+    ax.axis('off')
+
+    # Boxes are collected here and added as one PatchCollection once all are built
+    boxes = []
+
+    # Title
+    ax.text(5, 9.5, 'Course Materials RAG System Architecture', 
+            fontsize=20, fontweight='bold', ha='center', color=text_color)
+
+    # Document Ingestion Flow (Top)
+    ax.text(5, 8.8, 'Document Ingestion Flow', fontsize=16, fontweight='bold', 
+            ha='center', color=secondary_color)
+
+    # Document box
+    doc_box = FancyBboxPatch((0.5, 7.8), 1.5, 0.6, boxstyle="round,pad=0.1", 
+                             facecolor=light_gray, edgecolor=primary_color, linewidth=2)
+    boxes.append(doc_box)
+    ax.text(1.25, 8.1, 'Course\nDocuments\n(.txt, .pdf)', fontsize=10, ha='center', va='center')
+
+    # DocumentProcessor box
+    proc_box = FancyBboxPatch((2.5, 7.8), 1.5, 0.6, boxstyle="round,pad=0.1", 
+                              facecolor=accent_color, edgecolor=primary_color, linewidth=2)
+    boxes.append(proc_box)
+    ax.text(3.25, 8.1, 'Document\nProcessor\n(Parse & Chunk)', fontsize=10, ha='center', va='center')
+
+    # VectorStore box
+    vector_box = FancyBboxPatch((4.5, 7.8), 1.5, 0.6, boxstyle="round,pad=0.1", 
+                                facecolor=primary_color, edgecolor=primary_color, linewidth=2)
+    boxes.append(vector_box)
+    ax.text(5.25, 8.1, 'ChromaDB\nVector Store\n(Embeddings)', fontsize=10, ha='center', va='center', color='white')
+
+    # ChromaDB collections
+    catalog_box = FancyBboxPatch((6.5, 8.1), 1.2, 0.3, boxstyle="round,pad=0.05", 
+                                 facecolor=light_gray, edgecolor=primary_color, linewidth=1)
+    boxes.append(catalog_box)
+    ax.text(7.1, 8.25, 'course_catalog', fontsize=8, ha='center', va='center')
+
+    content_box = FancyBboxPatch((6.5, 7.7), 1.2, 0.3, boxstyle="round,pad=0.05", 
+                                 facecolor=light_gray, edgecolor=primary_color, linewidth=1)
+    boxes.append(content_box)
+    ax.text(7.1, 7.85, 'course_content', fontsize=8, ha='center', va='center')
+
+    # Query Processing Flow (Middle)
+    ax.text(5, 6.8, 'Query Processing Flow', fontsize=16, fontweight='bold', 
+            ha='center', color=secondary_color)
+
+    # User query
+    user_box = FancyBboxPatch((0.5, 5.8), 1.5, 0.6, boxstyle="round,pad=0.1", 
+                              facecolor=light_gray, edgecolor=secondary_color, linewidth=2)
+    boxes.append(user_box)
+    ax.text(1.25, 6.1, 'User Query\n"How does\nretrieval work?"', fontsize=10, ha='center', va='center')
+
+    # RAG System
+    rag_box = FancyBboxPatch((2.5, 5.8), 1.5, 0.6, boxstyle="round,pad=0.1", 
+                             facecolor=secondary_color, edgecolor=secondary_color, linewidth=2)
+    boxes.append(rag_box)
+    ax.text(3.25, 6.1, 'RAG System\n(Orchestrator)', fontsize=10, ha='center', va='center', color='white')
+
+    # AI Generator with Tools
+    ai_box = FancyBboxPatch((4.5, 5.8), 1.5, 0.6, boxstyle="round,pad=0.1", 
+                            facecolor=accent_color, edgecolor=accent_color, linewidth=2)
+    boxes.append(ai_box)
+    ax.text(5.25, 6.1, 'Claude AI\n+ Search Tools', fontsize=10, ha='center', va='center')
+
+    # Response
+    response_box = FancyBboxPatch((6.5, 5.8), 1.5, 0.6, boxstyle="round,pad=0.1", 
+                                  facecolor=light_gray, edgecolor=primary_color, linewidth=2)
+    boxes.append(response_box)
+    ax.text(7.25, 6.1, 'AI Response\n+ Sources', fontsize=10, ha='center', va='center')
+
+    # Arrows for the ingestion (y=8.1) and query (y=6.1) flows: all shafts in one
+    # LineCollection, all heads in one scatter
+    arrow_starts = [(x, y) for y in (8.1, 6.1) for x in (2, 4, 6)]
+    ax.add_collection(LineCollection(
+        [((x, y), (x + 0.4, y)) for x, y in arrow_starts], colors=text_color, linewidths=1
+    ))
+    ax.scatter([x + 0.42 for x, _ in arrow_starts], [y for _, y in arrow_starts],
+               marker='>', color=text_color, s=30)
+
+    # Detailed Components (Bottom)
+    ax.text(5, 4.8, 'Core Components', fontsize=16, fontweight='bold', 
+            ha='center', color=secondary_color)
+
+    # Component boxes
+    for x, y, _, face_color, _ in COMPONENTS:
+        boxes.append(FancyBboxPatch((x-0.6, y-0.3), 1.2, 0.6, boxstyle="round,pad=0.05", 
+                                    facecolor=face_color, edgecolor=primary_color, linewidth=1))
+    add_texts(ax, [(x, y, label, {'color': label_color}) for x, y, label, _, label_color in COMPONENTS],
+              fontsize=9, ha='center', va='center')
+
+    # One artist for every box; match_original keeps each box's own styling.
+    # Drawn beneath the arrows, which were added after their boxes.
+    ax.add_collection(PatchCollection(boxes, match_original=True, zorder=0.5))
+
+    # Data flow connections with curved arrows. Both ends are in data coordinates,
+    # so plain FancyArrowPatches on the patch path do what ConnectionPatch did.
+    # They stay out of the box PatchCollection: open "->" arrows would be filled there.
+    # Vector store to search tools
+    ax.add_patch(FancyArrowPatch((5.25, 7.8), (5, 4.1),
+                                 arrowstyle="->", shrinkA=5, shrinkB=5, mutation_scale=10,
+                                 connectionstyle="arc3,rad=0.3", color=primary_color, linewidth=2))
+
+    # Search tools to AI
+    ax.add_patch(FancyArrowPatch((5, 3.5), (5.25, 5.8),
+                                 arrowstyle="->", shrinkA=5, shrinkB=5, mutation_scale=10,
+                                 connectionstyle="arc3,rad=-0.3", color=secondary_color, linewidth=2))
+
+    # Add legend
+    legend_elements = [
+        patches.Patch(color=primary_color, label='Core Storage & API'),
+        patches.Patch(color=secondary_color, label='RAG Logic & Search'),
+        patches.Patch(color=accent_color, label='AI & Processing'),
+        patches.Patch(color=light_gray, label='Configuration & Models')
+    ]
+    ax.legend(handles=legend_elements, loc='lower left', bbox_to_anchor=(0, 0))
+
+    # Add workflow annotations
+    add_texts(ax, [
+        (1.25, 7.5, '1. Parse', {}),
+        (3.25, 7.5, '2. Chunk', {}),
+        (5.25, 7.5, '3. Embed', {}),
+        (7.1, 7.5, '4. Store', {}),
+        (1.25, 5.5, '1. Query', {}),
+        (3.25, 5.5, '2. Route', {}),
+        (5.25, 5.5, '3. Search', {}),
+        (7.25, 5.5, '4. Generate', {}),
+    ], fontsize=8, ha='center', color=text_color, weight='bold')
+
+    # Add document format example
+    ax.text(0.5, 1.5, 'Document Format:', fontsize=10, weight='bold', color=text_color)
+    ax.text(0.5, 1.2, 'Course Title: Advanced AI\nCourse Instructor: Dr. Smith\nLesson 1: Introduction\n  [lesson content...]\nLesson 2: Deep Learning\n  [lesson content...]', 
+            fontsize=8, color=text_color, family='monospace', 
+            bbox=dict(boxstyle="round,pad=0.3", facecolor=light_gray, alpha=0.8))
+
+    # Add technical details
+    ax.text(8.5, 1.5, 'Technical Stack:', fontsize=10, weight='bold', color=text_color)
+    ax.text(8.5, 1.2, '• FastAPI (Web Framework)\n• ChromaDB (Vector Database)\n• Claude AI (LLM)\n• Sentence Transformers\n• Pydantic (Data Models)', 
+            fontsize=8, color=text_color,
+            bbox=dict(boxstyle="round,pad=0.3", facecolor=light_gray, alpha=0.8))
+
+    plt.tight_layout()
+    plt.savefig(out_path, format='svg', bbox_inches='tight', facecolor='white',
+                metadata={'Date': None})
+    if png:
+        plt.savefig(png_path, dpi=DPI, bbox_inches='tight', facecolor='white')
+    if SHOW_DIAGRAM:
+        plt.show()
+
+    hash_path.write_text(current_hash)
+    return True
+
+
+if __name__ == "__main__":
+    if build_diagram():
+        print(f"System architecture diagram saved as '{DIAGRAM_PATH.name}'")
     else:
-        text_color_box = 'white'
-    
-    comp_box = FancyBboxPatch((x-0.6, y-0.3), 1.2, 0.6, boxstyle="round,pad=0.05", 
-                              facecolor=color, edgecolor=primary_color, linewidth=1)
-    ax.add_patch(comp_box)
-    ax.text(x, y, label, fontsize=9, ha='center', va='center', color=text_color_box)
-
-# Data flow connections with curved arrows
-# Vector store to search tools
-connection1 = ConnectionPatch((5.25, 7.8), (5, 4.1), "data", "data",
-                             arrowstyle="->", shrinkA=5, shrinkB=5, 
-                             connectionstyle="arc3,rad=0.3", color=primary_color, linewidth=2)
-ax.add_artist(connection1)
-
-# Search tools to AI
-connection2 = ConnectionPatch((5, 3.5), (5.25, 5.8), "data", "data",
-                             arrowstyle="->", shrinkA=5, shrinkB=5, 
-                             connectionstyle="arc3,rad=-0.3", color=secondary_color, linewidth=2)
-ax.add_artist(connection2)
-
-# Add legend
-legend_elements = [
-    patches.Patch(color=primary_color, label='Core Storage & API'),
-    patches.Patch(color=secondary_color, label='RAG Logic & Search'),
-    patches.Patch(color=accent_color, label='AI & Processing'),
-    patches.Patch(color=light_gray, label='Configuration & Models')
-]
-ax.legend(handles=legend_elements, loc='lower left', bbox_to_anchor=(0, 0))
-
-# Add workflow annotations
-ax.text(1.25, 7.5, '1. Parse', fontsize=8, ha='center', color=text_color, weight='bold')
-ax.text(3.25, 7.5, '2. Chunk', fontsize=8, ha='center', color=text_color, weight='bold')
-ax.text(5.25, 7.5, '3. Embed', fontsize=8, ha='center', color=text_color, weight='bold')
-ax.text(7.1, 7.5, '4. Store', fontsize=8, ha='center', color=text_color, weight='bold')
-
-ax.text(1.25, 5.5, '1. Query', fontsize=8, ha='center', color=text_color, weight='bold')
-ax.text(3.25, 5.5, '2. Route', fontsize=8, ha='center', color=text_color, weight='bold')
-ax.text(5.25, 5.5, '3. Search', fontsize=8, ha='center', color=text_color, weight='bold')
-ax.text(7.25, 5.5, '4. Generate', fontsize=8, ha='center', color=text_color, weight='bold')
-
-# Add document format example
-ax.text(0.5, 1.5, 'Document Format:', fontsize=10, weight='bold', color=text_color)
-ax.text(0.5, 1.2, 'Course Title: Advanced AI\nCourse Instructor: Dr. Smith\nLesson 1: Introduction\n  [lesson content...]\nLesson 2: Deep Learning\n  [lesson content...]', 
-        fontsize=8, color=text_color, family='monospace', 
-        bbox=dict(boxstyle="round,pad=0.3", facecolor=light_gray, alpha=0.8))
-
-# Add technical details
-ax.text(8.5, 1.5, 'Technical Stack:', fontsize=10, weight='bold', color=text_color)
-ax.text(8.5, 1.2, '• FastAPI (Web Framework)\n• ChromaDB (Vector Database)\n• Claude AI (LLM)\n• Sentence Transformers\n• Pydantic (Data Models)', 
-        fontsize=8, color=text_color,
-        bbox=dict(boxstyle="round,pad=0.3", facecolor=light_gray, alpha=0.8))
-
-plt.tight_layout()
-plt.savefig('/Users/kylekacius/Documents/dl-course-rag/backend/rag_system_diagram.png', 
-            dpi=300, bbox_inches='tight', facecolor='white')
-plt.show()
-
-print("System architecture diagram saved as 'rag_system_diagram.png'")
\ No newline at end of file
+        print(f"System architecture diagram '{DIAGRAM_PATH.name}' is up to date")
@@ -4,17 +4,18 @@ RAG System Flow Visualization
 Text-based diagram showing how the Course Materials RAG system works
 """
 
-def print_section(title, content="", separator="="):
-    print(f"\n{separator * 60}")
-    print(f" {title}")
-    print(f"{separator * 60}")
-    if content:
-        print(content)
+import sys
 
-def main():
-    print("🎓 COURSE MATERIALS RAG SYSTEM - ARCHITECTURE OVERVIEW")
-    
-    print_section("📄 DOCUMENT INGESTION FLOW", """
+BAR = "=" * 60
+
+
+def print_section(title, content="", bar=BAR):
+    """Write a titled section in one call; pass e.g. bar="-" * 60 for a lighter rule"""
+    header = f"\n{bar}\n {title}\n{bar}\n"
+    sys.stdout.write(f"{header}{content}\n" if content else header)
+
+
+_INGEST_BODY = """
     1. Raw Documents (.txt, .pdf, .docx)
        ↓
     2. DocumentProcessor (document_processor.py)
@@ -27,9 +28,9 @@ def main():
        • Stores in ChromaDB with 2 collections:
          - course_catalog: Course/lesson metadata
          - course_content: Searchable text chunks
-    """)
-    
-    print_section("🔍 QUERY PROCESSING FLOW", """
+    """
+
+_QUERY_BODY = """
     User Query: "How does retrieval work in RAG systems?"
        ↓
     1. FastAPI Endpoint (/api/query)
@@ -50,9 +51,9 @@ def main():
        • Cites sources from search results
        ↓
     6. Return to User (JSON response with answer + sources)
-    """)
-    
-    print_section("🏗️ CORE COMPONENTS", """
+    """
+
+_COMPONENTS_BODY = """
     ┌─────────────────┬──────────────────┬─────────────────────┐
     │ FILE            │ PURPOSE          │ KEY FEATURES        │
     ├─────────────────┼──────────────────┼─────────────────────┤
@@ -65,9 +66,9 @@ def main():
     │ models.py       │ Data Structures  │ Course, Lesson, etc │
     │ config.py       │ Settings         │ API keys, params    │
     └─────────────────┴──────────────────┴─────────────────────┘
-    """)
-    
-    print_section("💾 DATA STRUCTURE", """
+    """
+
+_DATA_BODY = """
     Course Document Format:
     ┌────────────────────────────────────────┐
     │ Course Title: Advanced AI Course      │
@@ -85,9 +86,9 @@ def main():
     Vector Storage:
     • course_catalog: {title, instructor, lessons_json}
     • course_content: {content, course_title, lesson_number, chunk_index}
-    """)
-    
-    print_section("⚙️ TECHNICAL STACK", """
+    """
+
+_STACK_BODY = """
     Backend:
     • FastAPI - Web framework and REST APIs
     • ChromaDB - Vector database for embeddings
@@ -103,9 +104,9 @@ def main():
     • Chunk Overlap: 100 characters  
     • Max Results: 5 per search
     • Max History: 2 conversation turns
-    """)
-    
-    print_section("🔄 LIVE SYSTEM STATUS", """
+    """
+
+_STATUS_BODY = """
     Currently Running:
     • Server: http://localhost:8000
     • Loaded Courses: 4
@@ -116,9 +117,9 @@ def main():
     2. Prompt Compression and Query Optimization (121 chunks)  
     3. Building Towards Computer Use with Anthropic (153 chunks)
     4. MCP: Build Rich-Context AI Apps with Anthropic (164 chunks)
-    """)
-    
-    print_section("🌊 REQUEST FLOW EXAMPLE", """
+    """
+
+_REQUEST_BODY = """
     [User] "What is retrieval augmented generation?"
         ↓
     [FastAPI] POST /api/query {"query": "...", "session_id": "abc123"}
@@ -136,7 +137,23 @@ def main():
     [RAGSystem] Returns {"answer": "...", "sources": [...]}
         ↓
     [User] Receives AI response with source citations
-    """)
+    """
+
+_SECTIONS = (
+    ("📄 DOCUMENT INGESTION FLOW", _INGEST_BODY),
+    ("🔍 QUERY PROCESSING FLOW", _QUERY_BODY),
+    ("🏗️ CORE COMPONENTS", _COMPONENTS_BODY),
+    ("💾 DATA STRUCTURE", _DATA_BODY),
+    ("⚙️ TECHNICAL STACK", _STACK_BODY),
+    ("🔄 LIVE SYSTEM STATUS", _STATUS_BODY),
+    ("🌊 REQUEST FLOW EXAMPLE", _REQUEST_BODY),
+)
+
+
+def main():
+    print("🎓 COURSE MATERIALS RAG SYSTEM - ARCHITECTURE OVERVIEW")
+    for title, body in _SECTIONS:
+        print_section(title, body)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
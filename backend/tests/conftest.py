@@ -0,0 +1,17 @@
+"""
+Shared pytest configuration for backend tests
+"""
+import sys
+import os
+
+# Add backend directory to Python path for imports, once per session
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def pytest_configure(config):
+    # Registered here too so the marker is known when pytest-xdist is not installed
+    config.addinivalue_line(
+        "markers", "xdist_group(name): run the marked tests on the same xdist worker"
+    )
@@ -2,43 +2,162 @@
 Tests for ai_generator module
 """
 import pytest
-from unittest.mock import Mock, MagicMock, patch
-import sys
-import os
+import threading
+import httpx
+from types import SimpleNamespace
+from anthropic import APIError, RateLimitError
+from unittest.mock import Mock, MagicMock, call
 
-# Add backend directory to Python path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ai_generator
+from ai_generator import AIGenerator, EMPTY_RESPONSE_MESSAGE
+from search_tools import CourseSearchTool, ToolManager
+from vector_store import SearchResults
 
-from ai_generator import AIGenerator
+# Keep this module on one xdist worker (--dist=loadgroup) since its fixtures
+# patch the shared ai_generator.anthropic attribute
+pytestmark = pytest.mark.xdist_group(name="ai_generator")
 
 
-class TestAIGenerator:
-    """Test AIGenerator functionality"""
+@pytest.fixture(scope="class")
+def mock_anthropic_client(request):
+    """Patch anthropic.Anthropic once per test class and share one mock client and tool manager"""
+    request.cls.mock_client = Mock()
+    request.cls.mock_tool_manager = Mock()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(ai_generator.anthropic, "Anthropic", Mock(return_value=request.cls.mock_client))
+        yield request.cls.mock_client
+
+
+# Key components and tool-calling instructions the system prompt must mention
+_REQUIRED_PROMPT_SUBSTRINGS = (
+    "course materials",
+    "content search tool",
+    "course outline tool",
+    "tool usage",
+    "course content questions",
+    "course outline questions",
+)
+_SYSTEM_PROMPT_LOWER = AIGenerator.SYSTEM_PROMPT.lower()
+
+# One request object reused by every error-path test that needs one
+_MOCK_HTTPX_REQUEST = httpx.Request("POST", "https://api.anthropic.com")
+
+
+def _tool_use(name, id, input):
+    """Build a tool_use content block"""
+    block = Mock(type="tool_use", id=id, input=input)
+    block.name = name  # Mock(name=...) would only set the mock's repr name
+    return block
+
+
+def _resp(stop_reason, content):
+    """Build an API response with the given stop reason and content blocks"""
+    return Mock(stop_reason=stop_reason, content=content)
+
+
+@pytest.fixture(scope="module")
+def anthropic_factory():
+    """Patch anthropic.Anthropic once for the module with a no-op client factory"""
+    factory = Mock()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(ai_generator.anthropic, "Anthropic", factory)
+        yield factory
+
+
+@pytest.fixture(scope="module")
+def ai_gen(anthropic_factory):
+    """One AIGenerator shared by tests that never call the API or mutate it"""
+    return AIGenerator(
+        api_key="test_api_key",
+        model="claude-sonnet-4-20250514"
+    )
+
+
+class TestAIGeneratorReadOnly:
+    """Test AIGenerator configuration and prompt handling without API calls"""
+    
+    def test_initialization(self, ai_gen):
+        """Test AIGenerator initialization"""
+        assert ai_gen.model == "claude-sonnet-4-20250514"
+        assert ai_gen.base_params["model"] == "claude-sonnet-4-20250514"
+        assert ai_gen.base_params["temperature"] == 0
+        assert ai_gen.base_params["max_tokens"] == 800
+    
+    def test_extract_text_skips_non_text_blocks(self):
+        """Test that text is taken from the first text block, not content[0]"""
+        response = _resp("end_turn", [
+            Mock(type="tool_use", spec=["type", "name"]),
+            SimpleNamespace(type="text", text="Answer after tool block")
+        ])
+        assert AIGenerator._extract_text(response) == "Answer after tool block"
+        
+        response.content = [Mock(type="tool_use", spec=["type", "name"])]
+        assert AIGenerator._extract_text(response) == ""
+    
+    def test_system_content_memoized_per_history(self, ai_gen):
+        """Test that system blocks are built once per conversation history"""
+        first = ai_gen._build_system_content("User: Hi")
+        assert ai_gen._build_system_content("User: Hi") is first
+        assert ai_gen._build_system_content("User: Bye") is not first
+        assert len(ai_gen._build_system_content(None)) == 1
+    
+    def test_build_system_prompt_strips_missing_tools(self, ai_gen):
+        """Test that guidance for unregistered tools is removed from the prompt"""
+        full = ai_gen.build_system_prompt(
+            frozenset({"search_course_content", "get_course_outline"})
+        )
+        assert full == AIGenerator.SYSTEM_PROMPT
+        
+        search_only = ai_gen.build_system_prompt(frozenset({"search_course_content"}))
+        assert "Content search tool" in search_only
+        assert "Course outline tool" not in search_only
+        assert "Course Outline Queries" not in search_only
+        assert "Response Protocol" in search_only
+        assert ai_gen.build_system_prompt(frozenset({"search_course_content"})) is search_only
+    
+    def test_api_key_usage(self, anthropic_factory):
+        """Test that API key is properly used"""
+        anthropic_factory.reset_mock()
+        AIGenerator(api_key="sk-test-key", model="claude-sonnet-4-20250514")
+        
+        assert anthropic_factory.mock_calls == [
+            call(api_key="sk-test-key", http_client=ai_generator._HTTP_CLIENT)
+        ]
+    
+    def test_http_client_shared_across_instances(self, anthropic_factory):
+        """Test that all generators reuse the pooled HTTP client"""
+        anthropic_factory.reset_mock()
+        AIGenerator(api_key="key-1", model="claude-sonnet-4-20250514")
+        AIGenerator(api_key="key-2", model="claude-sonnet-4-20250514")
+        
+        clients = [kwargs["http_client"] for _, kwargs in anthropic_factory.call_args_list]
+        assert clients[0] is clients[1]
+    
+    def test_system_prompt_content(self):
+        """Test that system prompt contains expected content"""
+        missing = [s for s in _REQUIRED_PROMPT_SUBSTRINGS if s not in _SYSTEM_PROMPT_LOWER]
+        assert not missing, missing
+
+
+@pytest.mark.usefixtures("mock_anthropic_client")
+class TestAIGeneratorStateful:
+    """Test AIGenerator request handling against the mocked client"""
     
     def setup_method(self):
         """Set up test fixtures"""
-        with patch('ai_generator.anthropic.Anthropic') as mock_anthropic:
-            self.mock_client = Mock()
-            mock_anthropic.return_value = self.mock_client
-            
-            self.ai_generator = AIGenerator(
-                api_key="test_api_key",
-                model="claude-sonnet-4-20250514"
-            )
-    
-    def test_initialization(self):
-        """Test AIGenerator initialization"""
-        assert self.ai_generator.model == "claude-sonnet-4-20250514"
-        assert self.ai_generator.base_params["model"] == "claude-sonnet-4-20250514"
-        assert self.ai_generator.base_params["temperature"] == 0
-        assert self.ai_generator.base_params["max_tokens"] == 800
+        # The class-wide mocks only need their configured behaviour cleared
+        self.mock_client.reset_mock(return_value=True, side_effect=True)
+        self.mock_tool_manager.reset_mock(return_value=True, side_effect=True)
+        
+        self.ai_generator = AIGenerator(
+            api_key="test_api_key",
+            model="claude-sonnet-4-20250514"
+        )
     
     def test_generate_response_without_tools(self):
         """Test generating response without tools"""
         # Mock API response
-        mock_response = Mock()
-        mock_response.stop_reason = "end_turn"
-        mock_response.content = [Mock(text="This is the AI response")]
+        mock_response = _resp("end_turn", [SimpleNamespace(type="text", text="This is the AI response")])
         self.mock_client.messages.create.return_value = mock_response
         
         response = self.ai_generator.generate_response("What is AI?")
@@ -55,9 +174,7 @@ class TestAIGenerator:
     
     def test_generate_response_with_conversation_history(self):
         """Test generating response with conversation history"""
-        mock_response = Mock()
-        mock_response.stop_reason = "end_turn"
-        mock_response.content = [Mock(text="Contextual response")]
+        mock_response = _resp("end_turn", [SimpleNamespace(type="text", text="Contextual response")])
         self.mock_client.messages.create.return_value = mock_response
         
         history = "Previous: Tell me about RAG\nAssistant: RAG stands for..."
@@ -69,231 +186,377 @@ class TestAIGenerator:
         
         assert response == "Contextual response"
         
-        # Check system prompt includes history
+        # Check system prompt includes history in an uncached block after the static prompt
         call_args = self.mock_client.messages.create.call_args[1]
-        assert "Previous conversation:" in call_args["system"]
-        assert history in call_args["system"]
+        static_block, history_block = call_args["system"]
+        assert static_block["text"] == AIGenerator.SYSTEM_PROMPT
+        assert static_block["cache_control"] == {"type": "ephemeral"}
+        assert "Previous conversation:" in history_block["text"]
+        assert history in history_block["text"]
+        assert "cache_control" not in history_block
     
     def test_generate_response_with_tools(self):
         """Test generating response with tools available"""
         # Mock API response without tool use
-        mock_response = Mock()
-        mock_response.stop_reason = "end_turn"
-        mock_response.content = [Mock(text="Direct response")]
+        mock_response = _resp("end_turn", [SimpleNamespace(type="text", text="Direct response")])
         self.mock_client.messages.create.return_value = mock_response
         
         tools = [{"name": "search_tool", "description": "Search content"}]
-        mock_tool_manager = Mock()
         
         response = self.ai_generator.generate_response(
             "Search for information",
             tools=tools,
-            tool_manager=mock_tool_manager
+            tool_manager=self.mock_tool_manager
         )
         
         assert response == "Direct response"
         
-        # Verify tools were passed
+        # Verify tools were passed with the last definition marked for caching
         call_args = self.mock_client.messages.create.call_args[1]
-        assert call_args["tools"] == tools
+        assert call_args["tools"] == [
+            {**tools[0], "cache_control": {"type": "ephemeral"}}
+        ]
         assert call_args["tool_choice"] == {"type": "auto"}
+        assert "cache_control" not in tools[0]
     
-    def test_generate_response_with_tool_use(self):
-        """Test generating response when AI uses tools"""
-        # Mock initial tool use response
-        mock_tool_block = Mock()
-        mock_tool_block.type = "tool_use"
-        mock_tool_block.name = "search_course_content"
-        mock_tool_block.id = "tool_123"
-        mock_tool_block.input = {"query": "test search"}
-        
-        initial_response = Mock()
-        initial_response.stop_reason = "tool_use"
-        initial_response.content = [mock_tool_block]
+    def test_system_prompt_specialized_to_tools(self):
+        """Test that tool-enabled calls send the prompt specialized to the given tools"""
+        mock_response = _resp("end_turn", [SimpleNamespace(type="text", text="Answer")])
+        self.mock_client.messages.create.return_value = mock_response
         
-        # Mock final response after tool execution
-        final_response = Mock()
-        final_response.content = [Mock(text="Response with tool results")]
+        self.ai_generator.generate_response(
+            "Search", tools=[{"name": "search_course_content"}], tool_manager=self.mock_tool_manager
+        )
         
-        # Set up client to return both responses
-        self.mock_client.messages.create.side_effect = [initial_response, final_response]
+        system_text = self.mock_client.messages.create.call_args[1]["system"][0]["text"]
+        assert "Course outline tool" not in system_text
+    
+    def test_marked_tools_reused_for_same_definitions(self):
+        """Test that the cache-marked tools list is built once per definitions list"""
+        tools = [{"name": "search_tool", "description": "Search content"}]
         
-        # Mock tool manager
-        mock_tool_manager = Mock()
-        mock_tool_manager.execute_tool.return_value = "Search results here"
+        first = self.ai_generator._prepared_tools(tools)
+        assert self.ai_generator._prepared_tools(tools) is first
         
-        tools = [{"name": "search_course_content", "description": "Search"}]
+        other_tools = [{"name": "outline_tool", "description": "Get outline"}]
+        assert self.ai_generator._prepared_tools(other_tools) is not first
+    
+    @pytest.mark.parametrize("tool_input,tool_result,expected_text,max_rounds", [
+        # Plain single tool call with the default round limit
+        ({"query": "test search"}, "Search results here", "Response with tool results", 2),
+        # Tool call with a course filter
+        (
+            {"query": "vector databases", "course_name": "AI Course"},
+            "[AI Course - Lesson 2]\nVector databases are...",
+            "Based on the search, vector databases...",
+            2,
+        ),
+        # max_rounds=1 mimics the original single-round behaviour
+        ({"query": "test"}, "Search results", "Single round response", 1),
+    ])
+    def test_generate_response_with_tool_use(self, tool_input, tool_result, expected_text, max_rounds):
+        """Test one tool round followed by a direct answer"""
+        self.mock_client.messages.create.side_effect = iter((
+            _resp("tool_use", [_tool_use("search_course_content", "tool_123", tool_input)]),
+            _resp("end_turn", [SimpleNamespace(type="text", text=expected_text)]),
+        ))
+        
+        self.mock_tool_manager.execute_tool.return_value = tool_result
         
         response = self.ai_generator.generate_response(
-            "Search for RAG information",
-            tools=tools,
-            tool_manager=mock_tool_manager
+            "Search for information",
+            tools=[{"name": "search_course_content", "description": "Search"}],
+            tool_manager=self.mock_tool_manager,
+            max_rounds=max_rounds
         )
         
-        assert response == "Response with tool results"
+        assert response == expected_text
         
-        # Verify tool was executed
-        mock_tool_manager.execute_tool.assert_called_once_with(
-            "search_course_content",
-            query="test search"
-        )
+        # Verify tool was executed once with the model's arguments
+        assert self.mock_tool_manager.execute_tool.mock_calls == [call("search_course_content", **tool_input)]
         
-        # Verify two API calls were made
+        # Verify two API calls: the tool round and the answer after tool execution
         assert self.mock_client.messages.create.call_count == 2
+        
+        # Final call carries: user message, assistant tool use, user tool results
+        messages = self.mock_client.messages.create.call_args_list[1][1]["messages"]
+        assert [m["role"] for m in messages[:3]] == ["user", "assistant", "user"]
+        
+        expected_tool_results = [
+            {"type": "tool_result", "tool_use_id": "tool_123", "content": tool_result}
+        ]
+        assert messages[2]["content"] == expected_tool_results
     
-    def test_tool_execution_flow(self):
-        """Test the complete tool execution flow"""
-        # Create a realistic tool use scenario
-        mock_tool_block = Mock()
-        mock_tool_block.type = "tool_use"
-        mock_tool_block.name = "search_course_content"
-        mock_tool_block.id = "tool_456"
-        mock_tool_block.input = {"query": "vector databases", "course_name": "AI Course"}
+    def test_multiple_tool_calls(self):
+        """Test handling multiple tool calls in one response"""
+        # Mock two tool use blocks
+        tool_block1 = _tool_use("search_course_content", "tool_1", {"query": "RAG"})
         
-        initial_response = Mock()
-        initial_response.stop_reason = "tool_use"
-        initial_response.content = [mock_tool_block]
+        tool_block2 = _tool_use("get_course_outline", "tool_2", {"course_name": "AI Course"})
         
-        final_response = Mock()
-        final_response.content = [Mock(text="Based on the search, vector databases...")]
+        initial_response = _resp("tool_use", [tool_block1, tool_block2])
         
-        self.mock_client.messages.create.side_effect = [initial_response, final_response]
+        final_response = _resp("end_turn", [SimpleNamespace(type="text", text="Combined response")])
         
-        mock_tool_manager = Mock()
-        mock_tool_manager.execute_tool.return_value = "[AI Course - Lesson 2]\nVector databases are..."
+        self.mock_client.messages.create.side_effect = iter((initial_response, final_response))
         
-        tools = [{"name": "search_course_content"}]
+        # Tools run concurrently, so results are keyed by tool name rather than call order
+        tool_outputs = {
+            "search_course_content": ("RAG search results", [{"text": "RAG", "url": None}]),
+            "get_course_outline": ("Course outline results", None)
+        }
+        self.mock_tool_manager.run_tool.side_effect = lambda name, **kwargs: tool_outputs[name]
+        
+        tools = [{"name": "search_course_content"}, {"name": "get_course_outline"}]
         
         response = self.ai_generator.generate_response(
-            "Tell me about vector databases",
+            "Search for RAG and show course outline",
             tools=tools,
-            tool_manager=mock_tool_manager
+            tool_manager=self.mock_tool_manager
         )
         
-        # Verify tool execution
-        mock_tool_manager.execute_tool.assert_called_once_with(
-            "search_course_content",
-            query="vector databases",
-            course_name="AI Course"
-        )
+        # Verify both tools were executed
+        assert self.mock_tool_manager.run_tool.call_count == 2
+        
+        # Check tool execution calls
+        self.mock_tool_manager.run_tool.assert_has_calls([
+            call("search_course_content", query="RAG"),
+            call("get_course_outline", course_name="AI Course")
+        ], any_order=True)
+        
+        # Sources are recorded after both calls, in tool_use order
+        assert self.mock_tool_manager.record_sources.mock_calls == [
+            call("search_course_content", [{"text": "RAG", "url": None}]),
+            call("get_course_outline", None)
+        ]
         
-        # Verify final API call structure
+        # Verify tool results keep the order of the tool_use blocks
+        expected_tool_results = [
+            {"type": "tool_result", "tool_use_id": "tool_1", "content": "RAG search results"},
+            {"type": "tool_result", "tool_use_id": "tool_2", "content": "Course outline results"},
+        ]
         final_call_args = self.mock_client.messages.create.call_args_list[1][1]
-        messages = final_call_args["messages"]
+        assert final_call_args["messages"][2]["content"] == expected_tool_results
+    
+    def test_concurrent_searches_record_sources_in_tool_use_order(self):
+        """Test that the last search block's sources win even when it finishes first"""
+        second_searched = threading.Event()
         
-        # Should have: user message, assistant tool use, user tool results, assistant final response
-        assert len(messages) >= 3  # New implementation may have additional messages
-        assert messages[0]["role"] == "user"
-        assert messages[1]["role"] == "assistant"
-        assert messages[2]["role"] == "user"
+        def search(query, course_name=None, lesson_number=None):
+            if query == "first":
+                # Hold the first search until the second one has run
+                second_searched.wait(timeout=5)
+            else:
+                second_searched.set()
+            return SearchResults(documents=[query], metadata=[{"course_title": course_name}], distances=[0.1])
         
-        # Tool results should be in the final message
-        tool_results = messages[2]["content"]
-        assert len(tool_results) == 1
-        assert tool_results[0]["type"] == "tool_result"
-        assert tool_results[0]["tool_use_id"] == "tool_456"
-        assert tool_results[0]["content"] == "[AI Course - Lesson 2]\nVector databases are..."
-    
-    def test_multiple_tool_calls(self):
-        """Test handling multiple tool calls in one response"""
-        # Mock two tool use blocks
-        tool_block1 = Mock()
-        tool_block1.type = "tool_use"
-        tool_block1.name = "search_course_content"
-        tool_block1.id = "tool_1"
-        tool_block1.input = {"query": "RAG"}
-        
-        tool_block2 = Mock()
-        tool_block2.type = "tool_use"
-        tool_block2.name = "get_course_outline"
-        tool_block2.id = "tool_2"
-        tool_block2.input = {"course_name": "AI Course"}
-        
-        initial_response = Mock()
-        initial_response.stop_reason = "tool_use"
-        initial_response.content = [tool_block1, tool_block2]
-        
-        final_response = Mock()
-        final_response.content = [Mock(text="Combined response")]
-        
-        self.mock_client.messages.create.side_effect = [initial_response, final_response]
-        
-        mock_tool_manager = Mock()
-        mock_tool_manager.execute_tool.side_effect = [
-            "RAG search results",
-            "Course outline results"
-        ]
+        store = Mock()
+        store.search.side_effect = search
+        store.get_course_link.return_value = None
+        tool_manager = ToolManager()
+        tool_manager.register_tool(CourseSearchTool(store))
         
-        tools = [{"name": "search_course_content"}, {"name": "get_course_outline"}]
+        tool_block1 = _tool_use("search_course_content", "tool_1", {"query": "first", "course_name": "Course A"})
+        
+        tool_block2 = _tool_use("search_course_content", "tool_2", {"query": "second", "course_name": "Course B"})
+        
+        initial_response = _resp("tool_use", [tool_block1, tool_block2])
+        
+        final_response = _resp("end_turn", [SimpleNamespace(type="text", text="Both courses")])
+        
+        self.mock_client.messages.create.side_effect = iter((initial_response, final_response))
         
         response = self.ai_generator.generate_response(
-            "Search for RAG and show course outline",
-            tools=tools,
-            tool_manager=mock_tool_manager
+            "Compare courses",
+            tools=tool_manager.get_tool_definitions(),
+            tool_manager=tool_manager
         )
         
-        # Verify both tools were executed
-        assert mock_tool_manager.execute_tool.call_count == 2
+        assert response == "Both courses"
+        assert tool_manager.get_last_sources() == [{"text": "Course B", "url": None}]
+    
+    def test_repeated_query_served_from_cache(self):
+        """Test that an identical request is answered without a second API call"""
+        mock_response = _resp("end_turn", [SimpleNamespace(type="text", text="Cached answer")])
+        self.mock_client.messages.create.return_value = mock_response
         
-        # Check tool execution calls
-        call_args_list = mock_tool_manager.execute_tool.call_args_list
-        assert call_args_list[0][0] == ("search_course_content",)
-        assert call_args_list[0][1] == {"query": "RAG"}
-        assert call_args_list[1][0] == ("get_course_outline",)
-        assert call_args_list[1][1] == {"course_name": "AI Course"}
+        first = self.ai_generator.generate_response("What is RAG?")
+        second = self.ai_generator.generate_response("What is RAG?")
         
-        # Verify tool results structure
-        final_call_args = self.mock_client.messages.create.call_args_list[1][1]
-        tool_results = final_call_args["messages"][2]["content"]
-        assert len(tool_results) == 2
-        assert tool_results[0]["tool_use_id"] == "tool_1"
-        assert tool_results[1]["tool_use_id"] == "tool_2"
+        assert first == second == "Cached answer"
+        self.mock_client.messages.create.assert_called_once()
     
-    @patch('ai_generator.anthropic.Anthropic')
-    def test_api_key_usage(self, mock_anthropic):
-        """Test that API key is properly used"""
-        AIGenerator(api_key="sk-test-key", model="claude-sonnet-4-20250514")
+    def test_cache_restores_sources_on_hit(self):
+        """Test that cached tool responses restore their sources"""
+        mock_response = _resp("end_turn", [SimpleNamespace(type="text", text="Answer with sources")])
+        self.mock_client.messages.create.return_value = mock_response
+        
+        sources = [{"text": "AI Course - Lesson 1", "url": None}]
+        self.mock_tool_manager.get_last_sources.return_value = sources
+        tools = [{"name": "search_course_content"}]
+        
+        self.ai_generator.generate_response("Query", tools=tools, tool_manager=self.mock_tool_manager)
+        response = self.ai_generator.generate_response("Query", tools=tools, tool_manager=self.mock_tool_manager)
         
-        mock_anthropic.assert_called_once_with(api_key="sk-test-key")
+        assert response == "Answer with sources"
+        self.mock_client.messages.create.assert_called_once()
+        assert self.mock_tool_manager.set_last_sources.mock_calls == [call(sources)]
     
-    def test_system_prompt_content(self):
-        """Test that system prompt contains expected content"""
-        prompt = AIGenerator.SYSTEM_PROMPT
+    def test_fallback_response_not_cached(self):
+        """Test that an empty tool-round answer is retried instead of served from cache"""
+        empty_response = _resp("end_turn", [])
+        
+        answer_response = _resp("end_turn", [SimpleNamespace(type="text", text="Real answer")])
         
-        # Check key components
-        assert "course materials" in prompt.lower()
-        assert "content search tool" in prompt.lower()
-        assert "course outline tool" in prompt.lower()
-        assert "tool usage" in prompt.lower()
+        self.mock_client.messages.create.side_effect = iter((empty_response, answer_response))
+        tools = [{"name": "search_course_content"}]
+        
+        first = self.ai_generator.generate_response("Query", tools=tools, tool_manager=self.mock_tool_manager)
+        second = self.ai_generator.generate_response("Query", tools=tools, tool_manager=self.mock_tool_manager)
+        
+        assert first == EMPTY_RESPONSE_MESSAGE
+        assert second == "Real answer"
+        assert self.mock_client.messages.create.call_count == 2
+    
+    def test_cache_key_includes_conversation_history(self):
+        """Test that a different conversation history bypasses the cache"""
+        mock_response = _resp("end_turn", [SimpleNamespace(type="text", text="Answer")])
+        self.mock_client.messages.create.return_value = mock_response
         
-        # Check that it instructs about tool calling
-        assert "course content questions" in prompt.lower()
-        assert "course outline questions" in prompt.lower()
+        self.ai_generator.generate_response("Follow-up", conversation_history="User: A")
+        self.ai_generator.generate_response("Follow-up", conversation_history="User: B")
+        
+        assert self.mock_client.messages.create.call_count == 2
+    
+    def test_generate_responses_batch_preserves_order(self):
+        """Test that batch generation returns answers in query order"""
+        def respond(**kwargs):
+            response = _resp("end_turn", [SimpleNamespace(type="text", text=f"Answer to {kwargs['messages'][0]['content']}")])
+            return response
+        self.mock_client.messages.create.side_effect = respond
+        
+        queries = [f"question {i}" for i in range(10)]
+        responses = self.ai_generator.generate_responses_batch(queries, batch_concurrency=4)
+        
+        assert responses == [f"Answer to question {i}" for i in range(10)]
+        assert self.mock_client.messages.create.call_count == 10
+    
+    def test_generate_responses_batch_tool_manager_per_query(self):
+        """Test that every batch query tracks its sources on its own tool manager"""
+        mock_response = _resp("end_turn", [SimpleNamespace(type="text", text="Answer")])
+        self.mock_client.messages.create.return_value = mock_response
+        managers = []
+        
+        def create_tool_manager():
+            managers.append(Mock())
+            return managers[-1]
+        
+        self.ai_generator.generate_responses_batch(
+            ["question 1", "question 2"],
+            tools=[{"name": "search_course_content"}],
+            tool_manager_factory=create_tool_manager
+        )
+        
+        assert len(managers) == 2
+        for manager in managers:
+            manager.get_last_sources.assert_called_once()
+    
+    def test_generate_responses_batch_empty(self):
+        """Test that an empty batch makes no API calls"""
+        assert self.ai_generator.generate_responses_batch([]) == []
+        self.mock_client.messages.create.assert_not_called()
+    
+    def test_generate_response_stream_without_tools(self):
+        """Test that a text-only response is streamed chunk by chunk"""
+        stream = MagicMock()
+        stream.__enter__.return_value.text_stream = iter(["Vector ", "databases ", "store embeddings."])
+        self.mock_client.messages.stream.return_value = stream
+        
+        chunks = list(self.ai_generator.generate_response_stream("What is a vector database?"))
+        
+        assert chunks == ["Vector ", "databases ", "store embeddings."]
+        self.mock_client.messages.create.assert_not_called()
+        call_args = self.mock_client.messages.stream.call_args[1]
+        assert call_args["messages"] == [{"role": "user", "content": "What is a vector database?"}]
+        assert "tools" not in call_args
+        
+        # Full streamed text is cached for repeat requests
+        assert list(self.ai_generator.generate_response_stream("What is a vector database?")) == [
+            "Vector databases store embeddings."
+        ]
+        self.mock_client.messages.stream.assert_called_once()
+    
+    def test_generate_response_stream_with_tools(self):
+        """Test that only the answer is streamed, not text from a round that requests tools"""
+        preamble_block = SimpleNamespace(type="text", text="Let me search the course materials.")
+        
+        tool_block = _tool_use("search_course_content", "tool_1", {"query": "RAG"})
+        
+        tool_response = _resp("tool_use", [preamble_block, tool_block])
+        
+        answer_response = _resp("end_turn", [SimpleNamespace(type="text", text="RAG combines search")])
+        
+        self.mock_client.messages.create.side_effect = iter((tool_response, answer_response))
+        self.mock_tool_manager.execute_tool.return_value = "Search results"
+        
+        chunks = list(self.ai_generator.generate_response_stream(
+            "Query",
+            tools=[{"name": "search_course_content"}],
+            tool_manager=self.mock_tool_manager
+        ))
+        
+        # Tool-enabled rounds are read whole, so the answer arrives as one chunk
+        assert chunks == ["RAG combines search"]
+        self.mock_client.messages.stream.assert_not_called()
+        assert self.mock_tool_manager.execute_tool.mock_calls == [
+            call("search_course_content", query="RAG")
+        ]
+    
+    def test_generate_response_stream_final_call_after_max_rounds(self):
+        """Test that the forced tool-less answer after the last round is streamed"""
+        tool_block = _tool_use("search_course_content", "tool_1", {"query": "RAG"})
+        
+        tool_response = _resp("tool_use", [tool_block])
+        
+        stream = MagicMock()
+        stream.__enter__.return_value.text_stream = iter(["Final ", "answer"])
+        self.mock_client.messages.create.return_value = tool_response
+        self.mock_client.messages.stream.return_value = stream
+        self.mock_tool_manager.execute_tool.return_value = "Search results"
+        
+        chunks = list(self.ai_generator.generate_response_stream(
+            "Query",
+            tools=[{"name": "search_course_content"}],
+            tool_manager=self.mock_tool_manager,
+            max_rounds=1
+        ))
+        
+        assert chunks == ["Final ", "answer"]
+        self.mock_client.messages.create.assert_called_once()
+        assert "tools" not in self.mock_client.messages.stream.call_args[1]
+
 
 
+@pytest.mark.usefixtures("mock_anthropic_client")
 class TestAIGeneratorErrorHandling:
     """Test AI generator error scenarios"""
     
     def setup_method(self):
         """Set up test fixtures for error testing"""
-        with patch('ai_generator.anthropic.Anthropic') as mock_anthropic:
-            self.mock_client = Mock()
-            mock_anthropic.return_value = self.mock_client
-            
-            self.ai_generator = AIGenerator(
-                api_key="test_api_key",
-                model="claude-sonnet-4-20250514"
-            )
+        # The class-wide mocks only need their configured behaviour cleared
+        self.mock_client.reset_mock(return_value=True, side_effect=True)
+        self.mock_tool_manager.reset_mock(return_value=True, side_effect=True)
+        
+        self.ai_generator = AIGenerator(
+            api_key="test_api_key",
+            model="claude-sonnet-4-20250514"
+        )
     
     def test_api_call_failure(self):
         """Test behavior when API call fails"""
-        # This test reveals that there's no exception handling in AIGenerator
-        from anthropic import APIError
-        import httpx
-        
-        # Create a mock request object with required body parameter
-        mock_request = httpx.Request("POST", "https://api.anthropic.com")
-        self.mock_client.messages.create.side_effect = APIError("API Error", request=mock_request, body={})
+        self.mock_client.messages.create.side_effect = APIError(
+            "API Error", request=_MOCK_HTTPX_REQUEST, body={}
+        )
         
         # Test the error handling in the new implementation
         response = self.ai_generator.generate_response("Test query")
@@ -301,32 +564,69 @@ class TestAIGeneratorErrorHandling:
         # Should get an error response instead of raising (new implementation handles gracefully)
         assert "API error occurred" in response or "unexpected error occurred" in response
     
+    def test_tool_round_rate_limit_surfaces_specific_message(self):
+        """Test that errors inside tool rounds reach the rate-limit handler and are not cached"""
+        mock_response = httpx.Response(429, request=_MOCK_HTTPX_REQUEST)
+        self.mock_client.messages.create.side_effect = RateLimitError(
+            "Rate limited", response=mock_response, body={}
+        )
+        tools = [{"name": "search_course_content"}]
+        
+        for _ in range(2):
+            response = self.ai_generator.generate_response(
+                "Test query", tools=tools, tool_manager=self.mock_tool_manager
+            )
+            assert response == "Rate limit exceeded. Please try again in a moment."
+        
+        assert self.mock_client.messages.create.call_count == 2
+    
+    def test_stream_api_call_failure(self):
+        """Test that streaming yields an error message instead of raising"""
+        mock_response = httpx.Response(429, request=_MOCK_HTTPX_REQUEST)
+        self.mock_client.messages.stream.side_effect = RateLimitError(
+            "Rate limited", response=mock_response, body={}
+        )
+        
+        chunks = list(self.ai_generator.generate_response_stream("Test query"))
+        
+        assert chunks == ["Rate limit exceeded. Please try again in a moment."]
+    
+    def test_stream_failure_after_partial_answer_raises(self):
+        """Test that a stream failing midway raises instead of appending an error to the answer"""
+        def text_stream():
+            yield "Partial "
+            raise APIError("Connection lost", request=_MOCK_HTTPX_REQUEST, body={})
+        
+        stream = MagicMock()
+        stream.__enter__.return_value.text_stream = text_stream()
+        self.mock_client.messages.stream.return_value = stream
+        
+        chunks = []
+        with pytest.raises(APIError):
+            for text in self.ai_generator.generate_response_stream("Test query"):
+                chunks.append(text)
+        
+        assert chunks == ["Partial "]
+        assert len(self.ai_generator.cache) == 0
+    
     def test_tool_manager_failure_during_tool_use(self):
         """Test when tool manager fails during tool execution"""
-        mock_tool_block = Mock()
-        mock_tool_block.type = "tool_use"
-        mock_tool_block.name = "failing_tool"
-        mock_tool_block.id = "tool_123"
-        mock_tool_block.input = {"query": "test"}
+        mock_tool_block = _tool_use("failing_tool", "tool_123", {"query": "test"})
         
-        initial_response = Mock()
-        initial_response.stop_reason = "tool_use"
-        initial_response.content = [mock_tool_block]
+        initial_response = _resp("tool_use", [mock_tool_block])
         
-        final_response = Mock()
-        final_response.content = [Mock(text="Error handling response")]
+        final_response = _resp("end_turn", [SimpleNamespace(type="text", text="Error handling response")])
         
-        self.mock_client.messages.create.side_effect = [initial_response, final_response]
+        self.mock_client.messages.create.side_effect = iter((initial_response, final_response))
         
-        mock_tool_manager = Mock()
-        mock_tool_manager.execute_tool.return_value = "Tool 'failing_tool' not found"
+        self.mock_tool_manager.execute_tool.return_value = "Tool 'failing_tool' not found"
         
         tools = [{"name": "search_course_content"}]
         
         response = self.ai_generator.generate_response(
             "Use failing tool",
             tools=tools,
-            tool_manager=mock_tool_manager
+            tool_manager=self.mock_tool_manager
         )
         
         # Verify the tool error is passed to the AI
@@ -335,69 +635,55 @@ class TestAIGeneratorErrorHandling:
         assert tool_results[0]["content"] == "Tool 'failing_tool' not found"
 
 
+@pytest.mark.usefixtures("mock_anthropic_client")
 class TestSequentialToolCalling:
     """Test sequential/multi-round tool calling functionality"""
     
     def setup_method(self):
         """Set up test fixtures for sequential tool calling"""
-        with patch('ai_generator.anthropic.Anthropic') as mock_anthropic:
-            self.mock_client = Mock()
-            mock_anthropic.return_value = self.mock_client
-            
-            self.ai_generator = AIGenerator(
-                api_key="test_api_key",
-                model="claude-sonnet-4-20250514"
-            )
+        # The class-wide mocks only need their configured behaviour cleared
+        self.mock_client.reset_mock(return_value=True, side_effect=True)
+        self.mock_tool_manager.reset_mock(return_value=True, side_effect=True)
+        
+        self.ai_generator = AIGenerator(
+            api_key="test_api_key",
+            model="claude-sonnet-4-20250514"
+        )
     
     def test_sequential_tool_calling_two_rounds(self):
         """Test complete 2-round sequential tool calling flow"""
-        # Round 1: Initial API call with tool use
-        round1_tool_block = Mock()
-        round1_tool_block.type = "tool_use"
-        round1_tool_block.name = "get_course_outline"
-        round1_tool_block.id = "tool_1"
-        round1_tool_block.input = {"course_name": "AI Fundamentals"}
-        
-        round1_initial_response = Mock()
-        round1_initial_response.stop_reason = "tool_use"
-        round1_initial_response.content = [round1_tool_block]
-        
-        # Round 1: After tool execution, AI decides to use another tool
-        round1_after_tool_block = Mock()
-        round1_after_tool_block.type = "tool_use"
-        round1_after_tool_block.name = "search_course_content"
-        round1_after_tool_block.id = "tool_2"
-        round1_after_tool_block.input = {"query": "vector databases", "course_name": "AI Course"}
-        
-        round1_after_tool_response = Mock()
-        round1_after_tool_response.stop_reason = "tool_use"
-        round1_after_tool_response.content = [round1_after_tool_block]
-        
-        # Round 2: After second tool execution, final response
-        final_response = Mock()
-        final_response.stop_reason = "end_turn"
-        final_response.content = [Mock(text="Based on both searches, here's the answer...")]
+        # Round 1: AI requests the course outline
+        round1_tool_block = _tool_use("get_course_outline", "tool_1", {"course_name": "AI Fundamentals"})
+        
+        round1_response = _resp("tool_use", [round1_tool_block])
+        
+        # Round 2: with the outline in hand, AI requests a content search
+        round2_tool_block = _tool_use("search_course_content", "tool_2", {"query": "vector databases", "course_name": "AI Course"})
+        
+        round2_response = _resp("tool_use", [round2_tool_block])
+        
+        # Round budget spent: the final call without tools returns the answer
+        final_response = _resp("end_turn", [SimpleNamespace(type="text", text="Based on both searches, here's the answer...")])
         
         # Set up API call sequence
-        self.mock_client.messages.create.side_effect = [
-            round1_initial_response,     # Round 1: Initial API call
-            round1_after_tool_response,  # Round 1: After first tool execution  
-            final_response               # Round 2: After second tool execution
-        ]
+        self.mock_client.messages.create.side_effect = iter((
+            round1_response,   # Round 1: outline tool use
+            round2_response,   # Round 2: search tool use
+            final_response     # Final call without tools
+        ))
         
         # Mock tool manager - both tools will be executed
-        mock_tool_manager = Mock()
-        mock_tool_manager.execute_tool.side_effect = [
+        self.mock_tool_manager.execute_tool.side_effect = iter((
             "Course outline: Lesson 1: Introduction, Lesson 2: Vector Databases...",
             "Search results: Vector databases store embeddings for similarity search..."
-        ]
+        ))
         
         tools = [{"name": "get_course_outline"}, {"name": "search_course_content"}]
         
         response = self.ai_generator.generate_response(
             "Search for a course that covers the same topic as lesson 2 of AI Fundamentals",
             tools=tools,
-            tool_manager=mock_tool_manager,
+            tool_manager=self.mock_tool_manager,
             max_rounds=2
         )
         
@@ -405,14 +691,10 @@ class TestSequentialToolCalling:
         assert response == "Based on both searches, here's the answer..."
         
         # Verify both tools were executed in sequence
-        assert mock_tool_manager.execute_tool.call_count == 2
-        
-        # Verify tool execution sequence
-        tool_calls = mock_tool_manager.execute_tool.call_args_list
-        assert tool_calls[0][0] == ("get_course_outline",)
-        assert tool_calls[0][1] == {"course_name": "AI Fundamentals"}
-        assert tool_calls[1][0] == ("search_course_content",)
-        assert tool_calls[1][1] == {"query": "vector databases", "course_name": "AI Course"}
+        assert self.mock_tool_manager.execute_tool.mock_calls == [
+            call("get_course_outline", course_name="AI Fundamentals"),
+            call("search_course_content", query="vector databases", course_name="AI Course"),
+        ]
         
         # Verify 3 API calls were made
         assert self.mock_client.messages.create.call_count == 3
@@ -420,19 +702,16 @@ class TestSequentialToolCalling:
     def test_early_termination_after_one_round(self):
         """Test natural termination when AI doesn't use tools in first round"""
         # Mock direct response without tool use
-        direct_response = Mock()
-        direct_response.stop_reason = "end_turn"
-        direct_response.content = [Mock(text="Direct answer without tools")]
+        direct_response = _resp("end_turn", [SimpleNamespace(type="text", text="Direct answer without tools")])
         
         self.mock_client.messages.create.return_value = direct_response
         
-        mock_tool_manager = Mock()
         tools = [{"name": "search_course_content"}]
         
         response = self.ai_generator.generate_response(
             "What is 2+2?",  # Simple query that doesn't need tools
             tools=tools,
-            tool_manager=mock_tool_manager,
+            tool_manager=self.mock_tool_manager,
             max_rounds=2
         )
         
@@ -440,142 +719,64 @@ class TestSequentialToolCalling:
         assert response == "Direct answer without tools"
         
         # Verify no tools were executed
-        mock_tool_manager.execute_tool.assert_not_called()
+        self.mock_tool_manager.execute_tool.assert_not_called()
         
         # Verify only one API call was made
         assert self.mock_client.messages.create.call_count == 1
     
-    def test_early_termination_after_tool_use_in_round_1(self):
-        """Test termination when AI uses tools in round 1 but not in round 2"""
-        # Round 1: Tool use
-        tool_block = Mock()
-        tool_block.type = "tool_use"
-        tool_block.name = "search_course_content"
-        tool_block.id = "tool_1"
-        tool_block.input = {"query": "machine learning"}
-        
-        round1_response = Mock()
-        round1_response.stop_reason = "tool_use"
-        round1_response.content = [tool_block]
-        
-        # After tool execution: Direct response (no more tools)
-        final_response = Mock()
-        final_response.stop_reason = "end_turn"
-        final_response.content = [Mock(text="Based on the search results: Machine learning is...")]
-        
-        self.mock_client.messages.create.side_effect = [round1_response, final_response]
-        
-        mock_tool_manager = Mock()
-        mock_tool_manager.execute_tool.return_value = "ML search results..."
-        
-        tools = [{"name": "search_course_content"}]
-        
-        response = self.ai_generator.generate_response(
-            "What is machine learning?",
-            tools=tools,
-            tool_manager=mock_tool_manager,
-            max_rounds=2
-        )
-        
-        # Verify response
-        assert response == "Based on the search results: Machine learning is..."
-        
-        # Verify tool was executed once
-        mock_tool_manager.execute_tool.assert_called_once_with(
-            "search_course_content", query="machine learning"
-        )
-        
-        # Verify 2 API calls (round 1 + after tool execution)
-        assert self.mock_client.messages.create.call_count == 2
-    
     def test_max_rounds_enforcement(self):
         """Test that system enforces maximum rounds limit"""
-        # Mock continuous tool use responses
-        tool_block1 = Mock()
-        tool_block1.type = "tool_use"
-        tool_block1.name = "search_course_content"
-        tool_block1.id = "tool_1"
-        tool_block1.input = {"query": "search1"}
-        
-        tool_block2 = Mock()
-        tool_block2.type = "tool_use"
-        tool_block2.name = "search_course_content"
-        tool_block2.id = "tool_2"
-        tool_block2.input = {"query": "search2"}
-        
-        tool_block3 = Mock()
-        tool_block3.type = "tool_use"
-        tool_block3.name = "search_course_content"
-        tool_block3.id = "tool_3"
-        tool_block3.input = {"query": "search3"}
-        
-        round1_initial = Mock()
-        round1_initial.stop_reason = "tool_use"
-        round1_initial.content = [tool_block1]
-        
-        round1_after_tool = Mock()
-        round1_after_tool.stop_reason = "tool_use"
-        round1_after_tool.content = [tool_block2]
-        
-        round2_after_tool = Mock()
-        round2_after_tool.stop_reason = "tool_use"
-        round2_after_tool.content = [tool_block3]
-        
-        # Note: We need to provide one more response than expected because 
-        # the system will try to make a final API call after hitting max rounds
-        final_fallback = Mock()
-        final_fallback.stop_reason = "end_turn"
-        final_fallback.content = [Mock(text="Max rounds reached")]
-        
         # AI keeps wanting to use tools, but we should stop at max_rounds
-        self.mock_client.messages.create.side_effect = [
-            round1_initial,      # Round 1: initial call
-            round1_after_tool,   # Round 1: after first tool
-            round2_after_tool,   # Round 2: after second tool  
-            final_fallback       # This may or may not be called depending on implementation
-        ]
+        round1_response, round2_response, extra_round_response = (
+            _resp("tool_use", [_tool_use("search_course_content", f"tool_{i}", {"query": f"search{i}"})])
+            for i in range(1, 4)
+        )
+        
+        # After max rounds a final call without tools forces a text answer
+        final_fallback = _resp("end_turn", [SimpleNamespace(type="text", text="Max rounds reached")])
+        
+        self.mock_client.messages.create.side_effect = iter((
+            round1_response,       # Round 1
+            round2_response,       # Round 2
+            final_fallback,        # Final call without tools
+            extra_round_response   # Never requested
+        ))
         
-        mock_tool_manager = Mock()
-        mock_tool_manager.execute_tool.side_effect = ["result1", "result2", "result3"]
+        self.mock_tool_manager.execute_tool.side_effect = iter(("result1", "result2", "result3"))
         
         tools = [{"name": "search_course_content"}]
         
         response = self.ai_generator.generate_response(
             "Complex query requiring many searches",
             tools=tools,
-            tool_manager=mock_tool_manager,
+            tool_manager=self.mock_tool_manager,
             max_rounds=2
         )
         
-        # Verify tool executions are limited by max_rounds (may be 2-3 depending on implementation)
-        # The important thing is that it doesn't go on indefinitely
-        assert mock_tool_manager.execute_tool.call_count <= 3
+        assert response == "Max rounds reached"
         
-        # The API call count can vary depending on implementation details
-        # The important thing is that exactly 2 tools were executed
-        assert self.mock_client.messages.create.call_count >= 3
+        # Exactly one tool execution per round
+        assert self.mock_tool_manager.execute_tool.call_count == 2
+        
+        # Two tool rounds plus one final call that cannot request tools
+        api_calls = self.mock_client.messages.create.call_args_list
+        assert len(api_calls) == 3
+        assert "tools" in api_calls[1][1]
+        assert "tools" not in api_calls[2][1]
+        assert "tool_choice" not in api_calls[2][1]
     
     def test_conversation_context_preservation(self):
         """Test that conversation context is preserved across rounds"""
         # Setup tool responses
-        tool_block = Mock()
-        tool_block.type = "tool_use"
-        tool_block.name = "search_course_content"
-        tool_block.id = "tool_1"
-        tool_block.input = {"query": "context test"}
+        tool_block = _tool_use("search_course_content", "tool_1", {"query": "context test"})
         
-        tool_response = Mock()
-        tool_response.stop_reason = "tool_use"
-        tool_response.content = [tool_block]
+        tool_response = _resp("tool_use", [tool_block])
         
-        final_response = Mock()
-        final_response.stop_reason = "end_turn"
-        final_response.content = [Mock(text="Response with context")]
+        final_response = _resp("end_turn", [SimpleNamespace(type="text", text="Response with context")])
         
-        self.mock_client.messages.create.side_effect = [tool_response, final_response]
+        self.mock_client.messages.create.side_effect = iter((tool_response, final_response))
         
-        mock_tool_manager = Mock()
-        mock_tool_manager.execute_tool.return_value = "Tool result"
+        self.mock_tool_manager.execute_tool.return_value = "Tool result"
         
         tools = [{"name": "search_course_content"}]
         history = "Previous: What is AI?\nAssistant: AI is artificial intelligence..."
@@ -584,54 +785,45 @@ class TestSequentialToolCalling:
             "Follow-up question",
             conversation_history=history,
             tools=tools,
-            tool_manager=mock_tool_manager
+            tool_manager=self.mock_tool_manager
         )
         
         # Verify system prompt included conversation history
         api_calls = self.mock_client.messages.create.call_args_list
         
         # Check both API calls included conversation history in system prompt
-        for call in api_calls:
-            system_content = call[1]["system"]
-            assert "Previous conversation:" in system_content
-            assert history in system_content
+        for api_call in api_calls:
+            history_text = api_call[1]["system"][-1]["text"]
+            assert "Previous conversation:" in history_text
+            assert history in history_text
     
     def test_tool_error_between_rounds(self):
         """Test graceful handling of tool execution errors between rounds"""
         # Round 1: Tool use
-        tool_block = Mock()
-        tool_block.type = "tool_use"
-        tool_block.name = "failing_tool"
-        tool_block.id = "tool_1"
-        tool_block.input = {"query": "test"}
+        tool_block = _tool_use("failing_tool", "tool_1", {"query": "test"})
         
-        tool_response = Mock()
-        tool_response.stop_reason = "tool_use"
-        tool_response.content = [tool_block]
+        tool_response = _resp("tool_use", [tool_block])
         
         # After tool execution with error: AI should handle gracefully
-        recovery_response = Mock()
-        recovery_response.stop_reason = "end_turn"
-        recovery_response.content = [Mock(text="I encountered an error but here's what I can tell you...")]
+        recovery_response = _resp("end_turn", [SimpleNamespace(type="text", text="I encountered an error but here's what I can tell you...")])
         
-        self.mock_client.messages.create.side_effect = [tool_response, recovery_response]
+        self.mock_client.messages.create.side_effect = iter((tool_response, recovery_response))
         
-        mock_tool_manager = Mock()
-        mock_tool_manager.execute_tool.side_effect = Exception("Tool failed")
+        self.mock_tool_manager.execute_tool.side_effect = Exception("Tool failed")
         
         tools = [{"name": "failing_tool"}]
         
         response = self.ai_generator.generate_response(
             "Test query",
             tools=tools,
-            tool_manager=mock_tool_manager
+            tool_manager=self.mock_tool_manager
         )
         
         # Verify graceful error handling
         assert response == "I encountered an error but here's what I can tell you..."
         
         # Verify tool execution was attempted
-        mock_tool_manager.execute_tool.assert_called_once()
+        self.mock_tool_manager.execute_tool.assert_called_once()
         
         # Verify that error was passed to AI as tool result
         final_call_args = self.mock_client.messages.create.call_args_list[1][1]
@@ -650,42 +842,3 @@ class TestSequentialToolCalling:
         error_result = next((r for r in tool_results if r["type"] == "tool_result"), None)
         assert error_result is not None
         assert "Tool execution failed" in error_result["content"]
-    
-    def test_backward_compatibility_with_single_round(self):
-        """Test that single-round behavior is preserved for backward compatibility"""
-        # Mock single tool use followed by direct response
-        tool_block = Mock()
-        tool_block.type = "tool_use"
-        tool_block.name = "search_course_content"
-        tool_block.id = "tool_1"
-        tool_block.input = {"query": "test"}
-        
-        initial_response = Mock()
-        initial_response.stop_reason = "tool_use"
-        initial_response.content = [tool_block]
-        
-        final_response = Mock()
-        final_response.stop_reason = "end_turn"
-        final_response.content = [Mock(text="Single round response")]
-        
-        self.mock_client.messages.create.side_effect = [initial_response, final_response]
-        
-        mock_tool_manager = Mock()
-        mock_tool_manager.execute_tool.return_value = "Search results"
-        
-        tools = [{"name": "search_course_content"}]
-        
-        # Test with max_rounds=1 (mimics old behavior)
-        response = self.ai_generator.generate_response(
-            "Test query",
-            tools=tools,
-            tool_manager=mock_tool_manager,
-            max_rounds=1
-        )
-        
-        assert response == "Single round response"
-        assert mock_tool_manager.execute_tool.call_count == 1
-
-
-if __name__ == "__main__":
-    pytest.main([__file__])
\ No newline at end of file
@@ -2,69 +2,76 @@
 End-to-end tests for RAG system functionality
 """
 import pytest
-from unittest.mock import Mock, MagicMock, patch
-import sys
 import os
-import tempfile
+from unittest.mock import Mock, patch, call, DEFAULT
+from dataclasses import dataclass
 
-# Add backend directory to Python path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from rag_system import RAGSystem
 from models import Course, Lesson, CourseChunk
 
 
+@dataclass(frozen=True, slots=True)
 class MockConfig:
     """Mock configuration for testing"""
-    CHUNK_SIZE = 800
-    CHUNK_OVERLAP = 100
-    CHROMA_PATH = "./test_chroma_db"
-    EMBEDDING_MODEL = "test-model"
-    MAX_RESULTS = 5
-    ANTHROPIC_API_KEY = "test-key"
-    ANTHROPIC_MODEL = "claude-sonnet-4-20250514"
-    MAX_HISTORY = 2
+    CHUNK_SIZE: int = 800
+    CHUNK_OVERLAP: int = 100
+    CHROMA_PATH: str = "./test_chroma_db"
+    EMBEDDING_MODEL: str = "test-model"
+    MAX_RESULTS: int = 5
+    ANTHROPIC_API_KEY: str = "test-key"
+    ANTHROPIC_MODEL: str = "claude-sonnet-4-20250514"
+    MAX_HISTORY: int = 2
+
 
+# Components RAGSystem builds, mapped to the test attribute holding each instance
+_COMPONENT_MOCKS = {
+    "DocumentProcessor": "mock_document_processor",
+    "VectorStore": "mock_vector_store",
+    "AIGenerator": "mock_ai_generator",
+    "SessionManager": "mock_session_manager",
+    "ToolManager": "mock_tool_manager",
+    "CourseSearchTool": "mock_search_tool",
+    "CourseOutlineTool": "mock_outline_tool",
+}
 
+
+@pytest.fixture(scope="class")
+def rag_system_fixture(request):
+    """Patch RAGSystem's components and build one system for the whole test class"""
+    # Deferred so collecting other test modules doesn't pull in the ML stack
+    from rag_system import RAGSystem
+    
+    cls = request.cls
+    cls.mock_config = MockConfig()
+    
+    # Mock all the component dependencies with a single patcher
+    with patch.multiple('rag_system', **dict.fromkeys(_COMPONENT_MOCKS, DEFAULT)) as mocks:
+        cls.component_classes = mocks
+        
+        # Configure mock classes to return mock instances
+        for name, attr in _COMPONENT_MOCKS.items():
+            setattr(cls, attr, Mock())
+            mocks[name].return_value = getattr(cls, attr)
+        
+        cls.rag_system = RAGSystem(cls.mock_config)
+        yield cls.rag_system
+
+
+@pytest.mark.usefixtures("rag_system_fixture")
 class TestRAGSystem:
     """Test RAG system end-to-end functionality"""
     
     def setup_method(self):
-        """Set up test fixtures with mocked components"""
-        self.mock_config = MockConfig()
-        
-        # Mock all the component dependencies
-        with patch('rag_system.DocumentProcessor') as mock_doc_proc, \
-             patch('rag_system.VectorStore') as mock_vector_store, \
-             patch('rag_system.AIGenerator') as mock_ai_gen, \
-             patch('rag_system.SessionManager') as mock_session_mgr, \
-             patch('rag_system.ToolManager') as mock_tool_mgr, \
-             patch('rag_system.CourseSearchTool') as mock_search_tool, \
-             patch('rag_system.CourseOutlineTool') as mock_outline_tool:
-            
-            # Set up mock instances
-            self.mock_document_processor = Mock()
-            self.mock_vector_store = Mock()
-            self.mock_ai_generator = Mock()
-            self.mock_session_manager = Mock()
-            self.mock_tool_manager = Mock()
-            self.mock_search_tool = Mock()
-            self.mock_outline_tool = Mock()
-            
-            # Configure mock classes to return mock instances
-            mock_doc_proc.return_value = self.mock_document_processor
-            mock_vector_store.return_value = self.mock_vector_store
-            mock_ai_gen.return_value = self.mock_ai_generator
-            mock_session_mgr.return_value = self.mock_session_manager
-            mock_tool_mgr.return_value = self.mock_tool_manager
-            mock_search_tool.return_value = self.mock_search_tool
-            mock_outline_tool.return_value = self.mock_outline_tool
-            
-            # Initialize RAG system
-            self.rag_system = RAGSystem(self.mock_config)
+        """Clear calls and configured behaviour left on the shared mocks"""
+        for name, attr in _COMPONENT_MOCKS.items():
+            self.component_classes[name].reset_mock()
+            getattr(self, attr).reset_mock(return_value=True, side_effect=True)
     
     def test_initialization(self):
         """Test RAG system initialization"""
+        # Construction calls were cleared in setup_method, so record them afresh
+        from rag_system import RAGSystem
+        self.rag_system = RAGSystem(self.mock_config)
+        
         assert self.rag_system.config == self.mock_config
         assert self.rag_system.document_processor == self.mock_document_processor
         assert self.rag_system.vector_store == self.mock_vector_store
@@ -73,8 +80,9 @@ class TestRAGSystem:
         assert self.rag_system.tool_manager == self.mock_tool_manager
         
         # Verify tools were registered
-        self.mock_tool_manager.register_tool.assert_any_call(self.mock_search_tool)
-        self.mock_tool_manager.register_tool.assert_any_call(self.mock_outline_tool)
+        self.mock_tool_manager.register_tool.assert_has_calls(
+            [call(self.mock_search_tool), call(self.mock_outline_tool)], any_order=True
+        )
         assert self.mock_tool_manager.register_tool.call_count == 2
     
     def test_add_course_document_success(self):
@@ -84,10 +92,10 @@ class TestRAGSystem:
             title="Test Course",
             instructor="Test Instructor",
             course_link="http://test.com",
-            lessons=[Lesson(1, "Lesson 1", "http://test.com/lesson1")]
+            lessons=[Lesson(lesson_number=1, title="Lesson 1", lesson_link="http://test.com/lesson1")]
         )
         mock_chunks = [
-            CourseChunk("Test Course", 1, 0, "Test content chunk")
+            CourseChunk(course_title="Test Course", lesson_number=1, chunk_index=0, content="Test content chunk")
         ]
         
         self.mock_document_processor.process_course_document.return_value = (mock_course, mock_chunks)
@@ -101,6 +109,7 @@ class TestRAGSystem:
         
         assert course == mock_course
         assert chunk_count == 1
+        self.mock_ai_generator.cache.clear.assert_called_once()
     
     def test_add_course_document_failure(self):
         """Test handling of document processing failure"""
@@ -111,9 +120,10 @@ class TestRAGSystem:
         assert course is None
         assert chunk_count == 0
         
-        # Verify vector store was not called
+        # Verify vector store was not called and cached answers survive
         self.mock_vector_store.add_course_metadata.assert_not_called()
         self.mock_vector_store.add_course_content.assert_not_called()
+        self.mock_ai_generator.cache.clear.assert_not_called()
     
     def test_query_without_session(self):
         """Test query processing without session context"""
@@ -128,12 +138,12 @@ class TestRAGSystem:
         
         # Verify AI generator call
         self.mock_ai_generator.generate_response.assert_called_once()
-        call_args = self.mock_ai_generator.generate_response.call_args
+        kwargs = self.mock_ai_generator.generate_response.call_args.kwargs
         
-        assert "Answer this question about course materials: What is RAG?" in call_args[1]["query"]
-        assert call_args[1]["conversation_history"] is None
-        assert call_args[1]["tools"] == self.mock_tool_manager.get_tool_definitions.return_value
-        assert call_args[1]["tool_manager"] == self.mock_tool_manager
+        assert kwargs["query"].endswith("Answer this question about course materials: What is RAG?")
+        assert kwargs["conversation_history"] is None
+        assert kwargs["tools"] == self.mock_tool_manager.get_tool_definitions.return_value
+        assert kwargs["tool_manager"] == self.mock_tool_manager
         
         # Verify response
         assert response == "AI response about course content"
@@ -160,8 +170,8 @@ class TestRAGSystem:
         self.mock_session_manager.get_conversation_history.assert_called_once_with(session_id)
         
         # Verify AI generator received history
-        call_args = self.mock_ai_generator.generate_response.call_args
-        assert call_args[1]["conversation_history"] == mock_history
+        kwargs = self.mock_ai_generator.generate_response.call_args.kwargs
+        assert kwargs["conversation_history"] == mock_history
         
         # Verify conversation was updated
         self.mock_session_manager.add_exchange.assert_called_once_with(
@@ -195,9 +205,9 @@ class TestRAGSystem:
         self.mock_tool_manager.get_tool_definitions.assert_called_once()
         
         # Verify AI generator received tools
-        call_args = self.mock_ai_generator.generate_response.call_args
-        assert call_args[1]["tools"] == [{"name": "search_course_content", "description": "Search course content"}]
-        assert call_args[1]["tool_manager"] == self.mock_tool_manager
+        kwargs = self.mock_ai_generator.generate_response.call_args.kwargs
+        assert kwargs["tools"] == [{"name": "search_course_content", "description": "Search course content"}]
+        assert kwargs["tool_manager"] == self.mock_tool_manager
         
         # Verify sources management
         self.mock_tool_manager.get_last_sources.assert_called_once()
@@ -206,7 +216,58 @@ class TestRAGSystem:
         assert response == "Based on the search results, RAG systems..."
         assert sources == mock_sources
     
-    def test_add_course_folder_with_existing_courses(self):
+    def test_query_batch(self):
+        """Test batch queries are wrapped in the course prompt and get their own tool managers"""
+        self.mock_ai_generator.generate_responses_batch.return_value = ["Answer 1", "Answer 2"]
+        
+        responses = self.rag_system.query_batch(["What is RAG?", "What is MCP?"])
+        
+        assert responses == ["Answer 1", "Answer 2"]
+        batch_call = self.mock_ai_generator.generate_responses_batch.call_args
+        assert batch_call.args[0] == [
+            "Answer this question about course materials: What is RAG?",
+            "Answer this question about course materials: What is MCP?"
+        ]
+        assert batch_call.kwargs["tool_manager_factory"] == self.rag_system._create_tool_manager
+        
+        # The shared tool manager's sources belong to other requests
+        self.mock_tool_manager.reset_sources.assert_not_called()
+        self.mock_session_manager.add_exchange.assert_not_called()
+    
+    def test_create_tool_manager(self):
+        """Test that each created tool manager gets fresh tools over the shared store"""
+        with patch('rag_system.ToolManager') as mock_tool_mgr, \
+             patch('rag_system.CourseSearchTool') as mock_search_tool, \
+             patch('rag_system.CourseOutlineTool') as mock_outline_tool:
+            tool_manager = self.rag_system._create_tool_manager()
+        
+        assert tool_manager == mock_tool_mgr.return_value
+        mock_search_tool.assert_called_once_with(self.mock_vector_store)
+        mock_outline_tool.assert_called_once_with(self.mock_vector_store)
+        assert tool_manager.register_tool.call_args_list == [
+            ((mock_search_tool.return_value,),), ((mock_outline_tool.return_value,),)
+        ]
+    
+    def test_query_stream(self):
+        """Test streaming query emits text events, then sources, and records history"""
+        self.mock_ai_generator.generate_response_stream.return_value = iter(["RAG ", "combines search"])
+        mock_sources = [{"text": "Test Course - Lesson 1", "url": "http://test.com"}]
+        self.mock_tool_manager.get_last_sources.return_value = mock_sources
+        self.mock_session_manager.get_conversation_history.return_value = None
+        
+        events = list(self.rag_system.query_stream("What is RAG?", "session_1"))
+        
+        assert events == [
+            {"type": "text", "text": "RAG "},
+            {"type": "text", "text": "combines search"},
+            {"type": "sources", "sources": mock_sources}
+        ]
+        self.mock_tool_manager.reset_sources.assert_called_once()
+        self.mock_session_manager.add_exchange.assert_called_once_with(
+            "session_1", "What is RAG?", "RAG combines search"
+        )
+    
+    def test_add_course_folder_with_existing_courses(self, tmp_path):
         """Test adding course folder with some existing courses"""
         # Mock existing courses
         self.mock_vector_store.get_existing_course_titles.return_value = ["Existing Course"]
@@ -224,20 +285,24 @@ class TestRAGSystem:
             course_link="http://existing.com", 
             lessons=[]
         )
-        new_chunks = [CourseChunk("New Course", 1, 0, "New content")]
-        existing_chunks = [CourseChunk("Existing Course", 1, 0, "Existing content")]
-        
-        # Mock file processing
-        self.mock_document_processor.process_course_document.side_effect = [
-            (new_course, new_chunks),
-            (existing_course, existing_chunks)
+        new_chunks = [CourseChunk(course_title="New Course", lesson_number=1, chunk_index=0, content="New content")]
+        existing_chunks = [
+            CourseChunk(course_title="Existing Course", lesson_number=1, chunk_index=0, content="Existing content")
         ]
         
-        with patch('os.path.exists', return_value=True), \
-             patch('os.listdir', return_value=['new_course.txt', 'existing_course.txt']), \
-             patch('os.path.isfile', return_value=True):
-            
-            total_courses, total_chunks = self.rag_system.add_course_folder("/test/docs")
+        # Mock file processing by file name, since directory listing order is not fixed
+        processed = {
+            "new_course.txt": (new_course, new_chunks),
+            "existing_course.txt": (existing_course, existing_chunks)
+        }
+        self.mock_document_processor.process_course_document.side_effect = (
+            lambda path: processed[os.path.basename(path)]
+        )
+        
+        (tmp_path / "new_course.txt").touch()
+        (tmp_path / "existing_course.txt").touch()
+        
+        total_courses, total_chunks = self.rag_system.add_course_folder(str(tmp_path))
         
         # Should only add the new course
         assert total_courses == 1
@@ -246,21 +311,21 @@ class TestRAGSystem:
         # Verify only new course was added to vector store
         self.mock_vector_store.add_course_metadata.assert_called_once_with(new_course)
         self.mock_vector_store.add_course_content.assert_called_once_with(new_chunks)
+        self.mock_ai_generator.cache.clear.assert_called_once()
     
-    def test_add_course_folder_clear_existing(self):
+    def test_add_course_folder_clear_existing(self, tmp_path):
         """Test adding course folder with clear_existing flag"""
-        with patch('os.path.exists', return_value=True), \
-             patch('os.listdir', return_value=[]):
-            
-            self.rag_system.add_course_folder("/test/docs", clear_existing=True)
+        self.mock_vector_store.get_existing_course_titles.return_value = []
+        
+        self.rag_system.add_course_folder(str(tmp_path), clear_existing=True)
         
-        # Verify data was cleared
+        # Verify data and the answers cached from it were cleared
         self.mock_vector_store.clear_all_data.assert_called_once()
+        self.mock_ai_generator.cache.clear.assert_called_once()
     
-    def test_add_course_folder_nonexistent_path(self):
+    def test_add_course_folder_nonexistent_path(self, tmp_path):
         """Test adding course folder with non-existent path"""
-        with patch('os.path.exists', return_value=False):
-            total_courses, total_chunks = self.rag_system.add_course_folder("/nonexistent")
+        total_courses, total_chunks = self.rag_system.add_course_folder(str(tmp_path / "nonexistent"))
         
         assert total_courses == 0
         assert total_chunks == 0
@@ -280,6 +345,9 @@ class TestRAGSystem:
     
     def test_tool_integration(self):
         """Test that tools are properly integrated with vector store"""
+        from rag_system import RAGSystem
+        RAGSystem(self.mock_config)
+        
         # Verify search tool was initialized with vector store
         from rag_system import CourseSearchTool
         CourseSearchTool.assert_called_once_with(self.mock_vector_store)
@@ -294,18 +362,13 @@ class TestRAGSystemErrorScenarios:
     
     def setup_method(self):
         """Set up test fixtures for error scenarios"""
+        from rag_system import RAGSystem
+        
         self.mock_config = MockConfig()
         
-        with patch('rag_system.DocumentProcessor'), \
-             patch('rag_system.VectorStore'), \
-             patch('rag_system.AIGenerator') as mock_ai_gen, \
-             patch('rag_system.SessionManager'), \
-             patch('rag_system.ToolManager'), \
-             patch('rag_system.CourseSearchTool'), \
-             patch('rag_system.CourseOutlineTool'):
-            
+        with patch.multiple('rag_system', **dict.fromkeys(_COMPONENT_MOCKS, DEFAULT)) as mocks:
             self.mock_ai_generator = Mock()
-            mock_ai_gen.return_value = self.mock_ai_generator
+            mocks['AIGenerator'].return_value = self.mock_ai_generator
             
             self.rag_system = RAGSystem(self.mock_config)
     
@@ -0,0 +1,62 @@
+"""
+Tests for response_cache module
+"""
+import pytest
+from unittest.mock import patch
+
+from response_cache import ResponseCache
+
+
+class TestResponseCache:
+    """Test ResponseCache LRU and TTL behavior"""
+    
+    def test_get_missing_key(self):
+        """Test that unknown keys return None"""
+        cache = ResponseCache()
+        
+        assert cache.get("missing") is None
+    
+    def test_set_and_get(self):
+        """Test storing and retrieving a value"""
+        cache = ResponseCache()
+        cache.set("key", ("answer", []))
+        
+        assert cache.get("key") == ("answer", [])
+    
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used entry is evicted when full"""
+        cache = ResponseCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # "b" is now least recently used
+        cache.set("c", 3)
+        
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+        assert len(cache) == 2
+    
+    def test_expired_entries_are_dropped(self):
+        """Test that entries past their TTL are not returned"""
+        cache = ResponseCache(ttl_seconds=10)
+        
+        with patch('response_cache.time.monotonic', return_value=100.0):
+            cache.set("key", "value")
+        with patch('response_cache.time.monotonic', return_value=109.0):
+            assert cache.get("key") == "value"
+        with patch('response_cache.time.monotonic', return_value=111.0):
+            assert cache.get("key") is None
+        
+        assert len(cache) == 0
+    
+    def test_clear(self):
+        """Test clearing all entries"""
+        cache = ResponseCache()
+        cache.set("key", "value")
+        cache.clear()
+        
+        assert cache.get("key") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -2,16 +2,37 @@
 Unit tests for search_tools module
 """
 import pytest
-from unittest.mock import Mock, MagicMock
-import sys
-import os
-
-# Add backend directory to Python path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from types import SimpleNamespace
+from unittest.mock import Mock
 
 from search_tools import CourseSearchTool, CourseOutlineTool, ToolManager
 from vector_store import SearchResults
 
+# Shared search payloads; the tools only read results, so one instance serves every test
+_EMPTY = SearchResults.empty(None)
+_SAMPLE_ONE = SearchResults(
+    documents=["Sample content"],
+    metadata=[{"course_title": "Test Course", "lesson_number": 1}],
+    distances=[0.1]
+)
+
+
+def _check_search_call(mock_vector_store, **expected):
+    """Assert the store was searched exactly once, with keyword arguments only"""
+    assert mock_vector_store.search.call_count == 1
+    args, kwargs = mock_vector_store.search.call_args
+    assert args == ()
+    assert kwargs == expected
+
+
+def _source_tool(name, last_sources):
+    """Plain source-tracking tool for tests that never inspect its calls"""
+    return SimpleNamespace(
+        last_sources=last_sources,
+        get_tool_definition=lambda: {"name": name},
+        execute=lambda **kwargs: ""
+    )
+
 
 class TestCourseSearchTool:
     """Test CourseSearchTool functionality"""
@@ -31,88 +52,66 @@ class TestCourseSearchTool:
         assert definition["input_schema"]["required"] == ["query"]
         assert "query" in definition["input_schema"]["properties"]
     
-    def test_execute_with_results(self):
-        """Test execute method with successful search results"""
-        # Mock successful search results
-        mock_results = SearchResults(
-            documents=["This is sample course content", "More course content"],
-            metadata=[
+    @pytest.mark.parametrize("course_name,lesson_number,docs,meta,expected_substrings", [
+        # No filters, several results
+        (
+            None, None,
+            ["This is sample course content", "More course content"],
+            [
                 {"course_title": "Test Course", "lesson_number": 1},
                 {"course_title": "Test Course", "lesson_number": 2}
             ],
-            distances=[0.1, 0.2]
-        )
-        self.mock_vector_store.search.return_value = mock_results
-        
-        result = self.search_tool.execute("test query")
-        
-        assert "[Test Course - Lesson 1]" in result
-        assert "[Test Course - Lesson 2]" in result
-        assert "This is sample course content" in result
-        assert "More course content" in result
-        self.mock_vector_store.search.assert_called_once_with(
-            query="test query",
-            course_name=None,
-            lesson_number=None
+            ["[Test Course - Lesson 1]", "[Test Course - Lesson 2]",
+             "This is sample course content", "More course content"]
+        ),
+        # Course name filter
+        (
+            "Specific Course", None,
+            ["Filtered course content"],
+            [{"course_title": "Specific Course", "lesson_number": 1}],
+            ["[Specific Course - Lesson 1]"]
+        ),
+        # Lesson number filter
+        (
+            None, 3,
+            ["Lesson-specific content"],
+            [{"course_title": "Test Course", "lesson_number": 3}],
+            ["[Test Course - Lesson 3]"]
+        ),
+        # Both filters
+        (
+            "Specific Course", 2,
+            ["Highly filtered content"],
+            [{"course_title": "Specific Course", "lesson_number": 2}],
+            ["[Specific Course - Lesson 2]"]
+        ),
+        # Empty results name the filters that were applied
+        (
+            "NonExistent Course", 5,
+            [], [],
+            ["No relevant content found in course 'NonExistent Course' in lesson 5."]
+        ),
+    ])
+    def test_execute_with_filters(self, course_name, lesson_number, docs, meta, expected_substrings):
+        """Test execute passes filters through and formats the matching results"""
+        self.mock_vector_store.search.return_value = SearchResults(
+            documents=docs, metadata=meta, distances=[0.1] * len(docs)
         )
-    
-    def test_execute_with_course_filter(self):
-        """Test execute method with course name filter"""
-        mock_results = SearchResults(
-            documents=["Filtered course content"],
-            metadata=[{"course_title": "Specific Course", "lesson_number": 1}],
-            distances=[0.1]
-        )
-        self.mock_vector_store.search.return_value = mock_results
-        
-        result = self.search_tool.execute("test query", course_name="Specific Course")
-        
-        self.mock_vector_store.search.assert_called_once_with(
-            query="test query",
-            course_name="Specific Course",
-            lesson_number=None
-        )
-        assert "[Specific Course - Lesson 1]" in result
-    
-    def test_execute_with_lesson_filter(self):
-        """Test execute method with lesson number filter"""
-        mock_results = SearchResults(
-            documents=["Lesson-specific content"],
-            metadata=[{"course_title": "Test Course", "lesson_number": 3}],
-            distances=[0.1]
-        )
-        self.mock_vector_store.search.return_value = mock_results
-        
-        result = self.search_tool.execute("test query", lesson_number=3)
-        
-        self.mock_vector_store.search.assert_called_once_with(
-            query="test query",
-            course_name=None,
-            lesson_number=3
-        )
-        assert "[Test Course - Lesson 3]" in result
-    
-    def test_execute_with_both_filters(self):
-        """Test execute method with both course and lesson filters"""
-        mock_results = SearchResults(
-            documents=["Highly filtered content"],
-            metadata=[{"course_title": "Specific Course", "lesson_number": 2}],
-            distances=[0.1]
-        )
-        self.mock_vector_store.search.return_value = mock_results
         
         result = self.search_tool.execute(
-            "test query", 
-            course_name="Specific Course",
-            lesson_number=2
+            "test query",
+            course_name=course_name,
+            lesson_number=lesson_number
         )
         
-        self.mock_vector_store.search.assert_called_once_with(
+        _check_search_call(
+            self.mock_vector_store,
             query="test query",
-            course_name="Specific Course",
-            lesson_number=2
+            course_name=course_name,
+            lesson_number=lesson_number
         )
-        assert "[Specific Course - Lesson 2]" in result
+        for expected in expected_substrings:
+            assert expected in result
     
     def test_execute_with_error(self):
         """Test execute method handles search errors"""
@@ -125,34 +124,15 @@ class TestCourseSearchTool:
     
     def test_execute_with_no_results(self):
         """Test execute method handles empty results"""
-        mock_results = SearchResults(documents=[], metadata=[], distances=[])
-        self.mock_vector_store.search.return_value = mock_results
+        self.mock_vector_store.search.return_value = _EMPTY
         
         result = self.search_tool.execute("test query")
         
         assert result == "No relevant content found."
     
-    def test_execute_with_no_results_and_filters(self):
-        """Test execute method handles empty results with filters"""
-        mock_results = SearchResults(documents=[], metadata=[], distances=[])
-        self.mock_vector_store.search.return_value = mock_results
-        
-        result = self.search_tool.execute(
-            "test query",
-            course_name="NonExistent Course",
-            lesson_number=5
-        )
-        
-        assert result == "No relevant content found in course 'NonExistent Course' in lesson 5."
-    
     def test_sources_tracking(self):
         """Test that sources are properly tracked for UI"""
-        mock_results = SearchResults(
-            documents=["Sample content"],
-            metadata=[{"course_title": "Test Course", "lesson_number": 1}],
-            distances=[0.1]
-        )
-        self.mock_vector_store.search.return_value = mock_results
+        self.mock_vector_store.search.return_value = _SAMPLE_ONE
         self.mock_vector_store.get_lesson_link.return_value = "http://example.com/lesson1"
         
         result = self.search_tool.execute("test query")
@@ -263,6 +243,24 @@ class TestToolManager:
         assert len(definitions) == 1
         assert definitions[0]["name"] == "test_tool"
     
+    def test_get_tool_definitions_cached(self):
+        """Test that definitions are built once and rebuilt after registration"""
+        self.tool_manager.register_tool(self.mock_tool)
+        
+        first = self.tool_manager.get_tool_definitions()
+        second = self.tool_manager.get_tool_definitions()
+        
+        assert first is second
+        # One call during registration, one to build the cached list
+        assert self.mock_tool.get_tool_definition.call_count == 2
+        
+        other_tool = Mock()
+        other_tool.get_tool_definition.return_value = {"name": "other_tool"}
+        self.tool_manager.register_tool(other_tool)
+        
+        definitions = self.tool_manager.get_tool_definitions()
+        assert [d["name"] for d in definitions] == ["test_tool", "other_tool"]
+    
     def test_execute_tool(self):
         """Test tool execution"""
         self.tool_manager.register_tool(self.mock_tool)
@@ -280,26 +278,68 @@ class TestToolManager:
     
     def test_get_last_sources(self):
         """Test getting last sources from tools"""
-        mock_search_tool = Mock()
-        mock_search_tool.last_sources = [{"text": "source1", "url": "url1"}]
-        mock_search_tool.get_tool_definition.return_value = {"name": "search_tool"}
+        mock_search_tool = _source_tool("search_tool", [{"text": "source1", "url": "url1"}])
         
         self.tool_manager.register_tool(mock_search_tool)
+        self.tool_manager.execute_tool("search_tool", query="test")
         
         sources = self.tool_manager.get_last_sources()
         
         assert sources == [{"text": "source1", "url": "url1"}]
     
+    def test_get_last_sources_from_most_recent_tool(self):
+        """Test that sources come from the most recently executed tool"""
+        first_tool = _source_tool("first_tool", [{"text": "first", "url": None}])
+        second_tool = _source_tool("second_tool", [{"text": "second", "url": None}])
+        
+        self.tool_manager.register_tool(first_tool)
+        self.tool_manager.register_tool(second_tool)
+        
+        assert self.tool_manager.get_last_sources() == []
+        
+        self.tool_manager.execute_tool("second_tool")
+        assert self.tool_manager.get_last_sources() == [{"text": "second", "url": None}]
+        
+        self.tool_manager.execute_tool("first_tool")
+        assert self.tool_manager.get_last_sources() == [{"text": "first", "url": None}]
+    
     def test_reset_sources(self):
         """Test resetting sources from all tools"""
-        mock_search_tool = Mock()
-        mock_search_tool.last_sources = [{"text": "source1", "url": "url1"}]
-        mock_search_tool.get_tool_definition.return_value = {"name": "search_tool"}
+        mock_search_tool = _source_tool("search_tool", [{"text": "source1", "url": "url1"}])
         
         self.tool_manager.register_tool(mock_search_tool)
+        self.tool_manager.execute_tool("search_tool")
         self.tool_manager.reset_sources()
         
         assert mock_search_tool.last_sources == []
+        assert self.tool_manager.get_last_sources() == []
+    
+    def test_set_last_sources(self):
+        """Test restoring sources onto a source-tracking tool"""
+        mock_search_tool = _source_tool("search_tool", [])
+        
+        self.tool_manager.register_tool(mock_search_tool)
+        self.tool_manager.set_last_sources([{"text": "cached", "url": None}])
+        
+        assert self.tool_manager.get_last_sources() == [{"text": "cached", "url": None}]
+    
+    def test_run_tool_defers_sources_to_record_sources(self):
+        """Test that run_tool returns a search's sources without storing them"""
+        search_tool = CourseSearchTool(Mock())
+        search_tool.store.search.return_value = SearchResults(
+            documents=["Content"], metadata=[{"course_title": "Course A"}], distances=[0.1]
+        )
+        search_tool.store.get_course_link.return_value = None
+        self.tool_manager.register_tool(search_tool)
+        
+        result, sources = self.tool_manager.run_tool("search_course_content", query="test")
+        
+        assert result == "[Course A]\nContent"
+        assert sources == [{"text": "Course A", "url": None}]
+        assert self.tool_manager.get_last_sources() == []
+        
+        self.tool_manager.record_sources("search_course_content", sources)
+        assert self.tool_manager.get_last_sources() == sources
 
 
 if __name__ == "__main__":
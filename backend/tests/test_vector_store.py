@@ -3,49 +3,44 @@ Integration tests for vector_store module
 """
 import pytest
 from unittest.mock import Mock, MagicMock, patch
-import sys
-import os
-import tempfile
 import json
 
-# Add backend directory to Python path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from vector_store import VectorStore, SearchResults
 from models import Course, Lesson, CourseChunk
 
+# Exact catalog encoding expected for the two-lesson course in test_add_course_metadata
+_EXPECTED_LESSONS_JSON = json.dumps([
+    {"lesson_number": 0, "lesson_title": "Introduction", "lesson_link": "http://example.com/lesson0"},
+    {"lesson_number": 1, "lesson_title": "Advanced", "lesson_link": "http://example.com/lesson1"}
+])
+
 
 class TestSearchResults:
     """Test SearchResults data class"""
     
-    def test_from_chroma(self):
+    @pytest.mark.parametrize("chroma_results,expected_docs,expected_meta,expected_dist,expected_empty", [
+        (
+            {
+                'documents': [['doc1', 'doc2']],
+                'metadatas': [[{'key': 'value1'}, {'key': 'value2'}]],
+                'distances': [[0.1, 0.2]]
+            },
+            ['doc1', 'doc2'], [{'key': 'value1'}, {'key': 'value2'}], [0.1, 0.2], False
+        ),
+        (
+            {'documents': [], 'metadatas': [], 'distances': []},
+            [], [], [], True
+        ),
+    ])
+    def test_from_chroma(self, chroma_results, expected_docs, expected_meta, expected_dist, expected_empty):
         """Test creating SearchResults from ChromaDB results"""
-        chroma_results = {
-            'documents': [['doc1', 'doc2']],
-            'metadatas': [[{'key': 'value1'}, {'key': 'value2'}]],
-            'distances': [[0.1, 0.2]]
-        }
-        
         results = SearchResults.from_chroma(chroma_results)
         
-        assert results.documents == ['doc1', 'doc2']
-        assert results.metadata == [{'key': 'value1'}, {'key': 'value2'}]
-        assert results.distances == [0.1, 0.2]
+        assert results.documents == expected_docs
+        assert results.metadata == expected_meta
+        assert results.distances == expected_dist
         assert results.error is None
-    
-    def test_from_chroma_empty(self):
-        """Test creating SearchResults from empty ChromaDB results"""
-        chroma_results = {
-            'documents': [],
-            'metadatas': [],
-            'distances': []
-        }
-        
-        results = SearchResults.from_chroma(chroma_results)
-        
-        assert results.documents == []
-        assert results.metadata == []
-        assert results.distances == []
+        assert results.is_empty() is expected_empty
     
     def test_empty_with_error(self):
         """Test creating empty SearchResults with error message"""
@@ -56,42 +51,53 @@ class TestSearchResults:
         assert results.distances == []
         assert results.error == "Test error message"
     
-    def test_is_empty(self):
-        """Test is_empty method"""
-        empty_results = SearchResults([], [], [])
-        non_empty_results = SearchResults(['doc'], [{}], [0.1])
+    def test_empty_interning(self):
+        """Test that empty results are shared per error message"""
+        assert SearchResults.empty("x") is SearchResults.empty("x")
+        assert SearchResults.empty("x") is not SearchResults.empty("y")
+
+
+@pytest.fixture(scope="class")
+def mocked_vector_store(request, tmp_path_factory):
+    """Build one VectorStore over mocked ChromaDB for the whole test class"""
+    cls = request.cls
+    # ChromaDB is mocked, so the path is never written; pytest cleans it up
+    cls.temp_dir = str(tmp_path_factory.mktemp("chroma"))
+    
+    # Mock ChromaDB components
+    cls.mock_client = Mock()
+    cls.mock_catalog_collection = Mock()
+    cls.mock_content_collection = Mock()
+    
+    # Mock the collections by name, so tests can build further stores on the same client
+    collections = {
+        "course_catalog": cls.mock_catalog_collection,
+        "course_content": cls.mock_content_collection
+    }
+    cls.mock_client.get_or_create_collection.side_effect = (
+        lambda name, **kwargs: collections[name]
+    )
+    
+    with patch('vector_store.chromadb.PersistentClient', return_value=cls.mock_client), \
+         patch('vector_store.chromadb.utils.embedding_functions.SentenceTransformerEmbeddingFunction'):
         
-        assert empty_results.is_empty() is True
-        assert non_empty_results.is_empty() is False
+        cls.vector_store = VectorStore(
+            chroma_path=cls.temp_dir,
+            embedding_model="test-model",
+            max_results=5
+        )
+    yield cls.vector_store
 
 
+@pytest.mark.usefixtures("mocked_vector_store")
 class TestVectorStore:
     """Test VectorStore functionality"""
     
     def setup_method(self):
-        """Set up test fixtures with mocked ChromaDB"""
-        # Create a temporary directory for testing
-        self.temp_dir = tempfile.mkdtemp()
-        
-        # Mock ChromaDB components
-        self.mock_client = Mock()
-        self.mock_catalog_collection = Mock()
-        self.mock_content_collection = Mock()
-        
-        # Mock the collections
-        self.mock_client.get_or_create_collection.side_effect = [
-            self.mock_catalog_collection,
-            self.mock_content_collection
-        ]
-        
-        with patch('vector_store.chromadb.PersistentClient', return_value=self.mock_client), \
-             patch('vector_store.chromadb.utils.embedding_functions.SentenceTransformerEmbeddingFunction'):
-            
-            self.vector_store = VectorStore(
-                chroma_path=self.temp_dir,
-                embedding_model="test-model",
-                max_results=5
-            )
+        """Clear mocked collection state and cached lookups left by earlier tests"""
+        self.mock_catalog_collection.reset_mock(return_value=True, side_effect=True)
+        self.mock_content_collection.reset_mock(return_value=True, side_effect=True)
+        self.vector_store._invalidate_caches()
     
     def test_initialization(self):
         """Test VectorStore initialization"""
@@ -272,8 +278,8 @@ class TestVectorStore:
             instructor="John Doe",
             course_link="http://example.com",
             lessons=[
-                Lesson(0, "Introduction", "http://example.com/lesson0"),
-                Lesson(1, "Advanced", "http://example.com/lesson1")
+                Lesson(lesson_number=0, title="Introduction", lesson_link="http://example.com/lesson0"),
+                Lesson(lesson_number=1, title="Advanced", lesson_link="http://example.com/lesson1")
             ]
         )
         
@@ -292,11 +298,8 @@ class TestVectorStore:
         assert metadata["course_link"] == "http://example.com"
         assert metadata["lesson_count"] == 2
         
-        # Check lessons JSON
-        lessons_data = json.loads(metadata["lessons_json"])
-        assert len(lessons_data) == 2
-        assert lessons_data[0]["lesson_number"] == 0
-        assert lessons_data[0]["lesson_title"] == "Introduction"
+        # Check lessons JSON, including key names and order
+        assert metadata["lessons_json"] == _EXPECTED_LESSONS_JSON
     
     def test_add_course_content(self):
         """Test adding course content chunks"""
@@ -377,6 +380,106 @@ class TestVectorStore:
         metadata = self.vector_store.get_course_metadata_by_title("NonExistent")
         
         assert metadata is None
+    
+    def test_resolve_course_name_cached(self):
+        """Test that course name resolution is memoized case-insensitively"""
+        self.mock_catalog_collection.query.return_value = {
+            'documents': [['Test Course']],
+            'metadatas': [[{'title': 'Test Course'}]],
+            'distances': [[0.1]]
+        }
+        
+        assert self.vector_store._resolve_course_name("Test") == "Test Course"
+        assert self.vector_store._resolve_course_name(" test ") == "Test Course"
+        
+        self.mock_catalog_collection.query.assert_called_once_with(
+            query_texts=["Test"],
+            n_results=1
+        )
+    
+    def test_resolve_course_name_error_not_cached(self):
+        """Test that failed resolutions are retried on the next call"""
+        self.mock_catalog_collection.query.side_effect = [
+            Exception("Catalog unavailable"),
+            {
+                'documents': [['Test Course']],
+                'metadatas': [[{'title': 'Test Course'}]],
+                'distances': [[0.1]]
+            }
+        ]
+        
+        assert self.vector_store._resolve_course_name("Test") is None
+        assert self.vector_store._resolve_course_name("Test") == "Test Course"
+    
+    def test_resolve_course_name_no_match_not_cached(self):
+        """Test that a name with no matching course is looked up again"""
+        self.mock_catalog_collection.query.side_effect = [
+            {'documents': [[]], 'metadatas': [[]], 'distances': [[]]},
+            {
+                'documents': [['Test Course']],
+                'metadatas': [[{'title': 'Test Course'}]],
+                'distances': [[0.1]]
+            }
+        ]
+        
+        assert self.vector_store._resolve_course_name("Test") is None
+        assert self.vector_store._resolve_course_name("Test") == "Test Course"
+    
+    def test_lookup_racing_catalog_change_not_cached(self):
+        """Test that a lookup overlapping a catalog change does not store its result"""
+        def query_during_change(**kwargs):
+            self.vector_store._invalidate_caches()
+            return {
+                'documents': [['Test Course']],
+                'metadatas': [[{'title': 'Test Course'}]],
+                'distances': [[0.1]]
+            }
+        self.mock_catalog_collection.query.side_effect = query_during_change
+        
+        self.vector_store._resolve_course_name("Test")
+        self.vector_store._resolve_course_name("Test")
+        
+        assert self.mock_catalog_collection.query.call_count == 2
+    
+    def test_links_loaded_once_per_course(self):
+        """Test that course and lesson links share one cached catalog lookup"""
+        self.mock_catalog_collection.get.return_value = {
+            'metadatas': [{
+                'title': 'Test Course',
+                'course_link': 'http://example.com',
+                'lessons_json': json.dumps([
+                    {"lesson_number": 1, "lesson_title": "Intro", "lesson_link": "http://example.com/1"},
+                    {"lesson_number": 2, "lesson_title": "Next", "lesson_link": "http://example.com/2"}
+                ])
+            }]
+        }
+        
+        assert self.vector_store.get_lesson_link("Test Course", 1) == "http://example.com/1"
+        assert self.vector_store.get_lesson_link("Test Course", 2) == "http://example.com/2"
+        assert self.vector_store.get_lesson_link("Test Course", 3) is None
+        assert self.vector_store.get_course_link("Test Course") == "http://example.com"
+        
+        self.mock_catalog_collection.get.assert_called_once_with(ids=["Test Course"])
+    
+    def test_caches_cleared_when_catalog_changes(self):
+        """Test that adding a course invalidates cached lookups"""
+        self.mock_catalog_collection.query.return_value = {
+            'documents': [['Test Course']],
+            'metadatas': [[{'title': 'Test Course'}]],
+            'distances': [[0.1]]
+        }
+        self.mock_catalog_collection.get.return_value = {
+            'metadatas': [{'title': 'Test Course', 'course_link': 'http://example.com'}]
+        }
+        
+        self.vector_store._resolve_course_name("Test")
+        self.vector_store.get_course_link("Test Course")
+        self.vector_store.add_course_metadata(Course(title="New Course"))
+        self.vector_store._resolve_course_name("Test")
+        self.vector_store.get_course_link("Test Course")
+        
+        assert self.mock_catalog_collection.query.call_count == 2
+        assert self.mock_catalog_collection.get.call_count == 2
 
 
 if __name__ == "__main__":
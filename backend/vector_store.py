@@ -1,11 +1,14 @@
 import chromadb
+import json
+import threading
+from collections import OrderedDict
 from chromadb.config import Settings
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
+from functools import lru_cache
 from models import Course, CourseChunk
-from sentence_transformers import SentenceTransformer
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SearchResults:
     """Container for search results with metadata"""
     documents: List[str]
@@ -23,8 +26,13 @@ class SearchResults:
         )
     
     @classmethod
-    def empty(cls, error_msg: str) -> 'SearchResults':
-        """Create empty results with error message"""
+    def empty(cls, error_msg: Optional[str]) -> 'SearchResults':
+        """Create empty results with error message (shared per message, do not mutate)"""
+        return cls._empty_cached(error_msg)
+    
+    @classmethod
+    @lru_cache(maxsize=64)
+    def _empty_cached(cls, error_msg: Optional[str]) -> 'SearchResults':
         return cls(documents=[], metadata=[], distances=[], error=error_msg)
     
     def is_empty(self) -> bool:
@@ -34,8 +42,18 @@ class SearchResults:
 class VectorStore:
     """Vector storage using ChromaDB for course content and metadata"""
     
+    # Maximum number of distinct course names whose resolution is remembered
+    COURSE_NAME_CACHE_SIZE = 512
+    
     def __init__(self, chroma_path: str, embedding_model: str, max_results: int = 5):
         self.max_results = max_results
+        
+        # Lookups that are deterministic for a given catalog; cleared whenever it changes
+        self._course_name_cache: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._link_cache: Dict[str, Dict[str, Any]] = {}
+        # Bumped on every invalidation, so a lookup that raced a catalog change is not stored
+        self._cache_generation = 0
+        self._cache_lock = threading.Lock()
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(
             path=chroma_path,
@@ -100,21 +118,74 @@ class VectorStore:
             return SearchResults.empty(f"Search error: {str(e)}")
     
     def _resolve_course_name(self, course_name: str) -> Optional[str]:
-        """Use vector search to find best matching course by name"""
+        """
+        Use vector search to find best matching course by name (memoized per name).
+        
+        Only matches are remembered: a name with no match is looked up again,
+        since the course it refers to may be ingested later.
+        """
+        cache_key = course_name.strip().lower()
+        with self._cache_lock:
+            if cache_key in self._course_name_cache:
+                self._course_name_cache.move_to_end(cache_key)
+                return self._course_name_cache[cache_key]
+            generation = self._cache_generation
+        
         try:
             results = self.course_catalog.query(
                 query_texts=[course_name],
                 n_results=1
             )
             
-            if results['documents'][0] and results['metadatas'][0]:
-                # Return the title (which is now the ID)
-                return results['metadatas'][0][0]['title']
+            if not (results['documents'][0] and results['metadatas'][0]):
+                return None
+            
+            # Return the title (which is now the ID)
+            course_title = results['metadatas'][0][0]['title']
+            with self._cache_lock:
+                if generation == self._cache_generation:
+                    self._course_name_cache[cache_key] = course_title
+                    if len(self._course_name_cache) > self.COURSE_NAME_CACHE_SIZE:
+                        self._course_name_cache.popitem(last=False)
+            return course_title
         except Exception as e:
             print(f"Error resolving course name: {e}")
         
         return None
     
+    def _get_course_links(self, course_title: str) -> Dict[str, Any]:
+        """Get course and lesson links for a course, loading them once per course"""
+        with self._cache_lock:
+            links = self._link_cache.get(course_title)
+            if links is not None:
+                return links
+            generation = self._cache_generation
+        
+        # Get course by ID (title is the ID)
+        results = self.course_catalog.get(ids=[course_title])
+        links = {"course_link": None, "lessons": {}}
+        if results and 'metadatas' in results and results['metadatas']:
+            metadata = results['metadatas'][0]
+            links["course_link"] = metadata.get('course_link')
+            lessons_json = metadata.get('lessons_json')
+            if lessons_json:
+                links["lessons"] = {
+                    lesson.get('lesson_number'): lesson.get('lesson_link')
+                    for lesson in json.loads(lessons_json)
+                }
+        
+        with self._cache_lock:
+            if generation == self._cache_generation:
+                self._link_cache[course_title] = links
+        return links
+    
+    def _invalidate_caches(self):
+        """Forget cached catalog lookups after the catalog changes"""
+        with self._cache_lock:
+            self._cache_generation += 1
+            self._course_name_cache.clear()
+            self._link_cache.clear()
+    
     def _build_filter(self, course_title: Optional[str], lesson_number: Optional[int]) -> Optional[Dict]:
         """Build ChromaDB filter from search parameters"""
         if not course_title and lesson_number is None:
@@ -134,8 +205,6 @@ class VectorStore:
     
     def add_course_metadata(self, course: Course):
         """Add course information to the catalog for semantic search"""
-        import json
-
         course_text = course.title
         
         # Build lessons metadata and serialize as JSON string
@@ -158,6 +227,9 @@ class VectorStore:
             }],
             ids=[course.title]
         )
+        
+        # Only after the add, so no lookup can re-cache the old catalog
+        self._invalidate_caches()
     
     def add_course_content(self, chunks: List[CourseChunk]):
         """Add course content chunks to the vector store"""
@@ -187,6 +259,7 @@ class VectorStore:
             # Recreate collections
             self.course_catalog = self._create_collection("course_catalog")
             self.course_content = self._create_collection("course_content")
+            self._invalidate_caches()
         except Exception as e:
             print(f"Error clearing data: {e}")
     
@@ -215,7 +288,6 @@ class VectorStore:
     
     def get_all_courses_metadata(self) -> List[Dict[str, Any]]:
         """Get metadata for all courses in the vector store"""
-        import json
         try:
             results = self.course_catalog.get()
             if results and 'metadatas' in results:
@@ -236,32 +308,15 @@ class VectorStore:
     def get_course_link(self, course_title: str) -> Optional[str]:
         """Get course link for a given course title"""
         try:
-            # Get course by ID (title is the ID)
-            results = self.course_catalog.get(ids=[course_title])
-            if results and 'metadatas' in results and results['metadatas']:
-                metadata = results['metadatas'][0]
-                return metadata.get('course_link')
-            return None
+            return self._get_course_links(course_title)["course_link"]
         except Exception as e:
             print(f"Error getting course link: {e}")
             return None
     
     def get_lesson_link(self, course_title: str, lesson_number: int) -> Optional[str]:
         """Get lesson link for a given course title and lesson number"""
-        import json
         try:
-            # Get course by ID (title is the ID)
-            results = self.course_catalog.get(ids=[course_title])
-            if results and 'metadatas' in results and results['metadatas']:
-                metadata = results['metadatas'][0]
-                lessons_json = metadata.get('lessons_json')
-                if lessons_json:
-                    lessons = json.loads(lessons_json)
-                    # Find the lesson with matching number
-                    for lesson in lessons:
-                        if lesson.get('lesson_number') == lesson_number:
-                            return lesson.get('lesson_link')
-            return None
+            return self._get_course_links(course_title)["lessons"].get(lesson_number)
         except Exception as e:
             print(f"Error getting lesson link: {e}")
             return None